@@ -29,7 +29,7 @@ resource "aws_lambda_layer_version" "gmail" {
   layer_name          = "ses-mail-gmail-${var.environment}"
   source_code_hash    = data.archive_file.gmail_layer_zip.output_base64sha256
   compatible_runtimes = ["python3.12"]
-  description         = "Gmail API dependencies: google-auth, google-api-python-client"
+  description         = "Gmail API dependencies: google-auth, requests"
 }
 
 # ===========================
@@ -5,28 +5,41 @@ This Lambda function is triggered by SQS messages from the gmail-forwarder queue
 It processes enriched email events from EventBridge and imports emails into Gmail.
 """
 
-import base64
+import functools
 import json
 import os
+import re
+import shutil
+import tempfile
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 from http import HTTPStatus
-from typing import Dict, Any, List
+from typing import TYPE_CHECKING, Dict, Any, List
 
 import boto3
+import requests
+from botocore.config import Config
 from botocore.exceptions import ClientError
+from requests.adapters import HTTPAdapter
 
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
-from google.oauth2.credentials import Credentials
-from google.auth.transport.requests import Request
 from google.auth.exceptions import RefreshError
 
+if TYPE_CHECKING:
+    from google.oauth2.credentials import Credentials
+
 # X-Ray SDK for distributed tracing
+# Only patch the libraries this function uses (patch_all walks every supported library)
 from aws_xray_sdk.core import xray_recorder
-from aws_xray_sdk.core import patch_all
-patch_all()
+from aws_xray_sdk.core import patch
+patch(('botocore', 'requests'))
 
 # Configure structured JSON logging
-from aws_lambda_powertools import Logger
+from aws_lambda_powertools import Logger, Metrics
+from aws_lambda_powertools.metrics import MetricUnit
+from aws_lambda_powertools.utilities.batch import BatchProcessor, EventType, process_partial_response
+from aws_lambda_powertools.utilities.data_classes.sqs_event import SQSRecord
 logger = Logger(service="ses-mail-gmail-forwarder")
 
 # Environment configuration
@@ -37,21 +50,83 @@ RETRY_QUEUE_URL = os.environ.get('RETRY_QUEUE_URL')
 DYNAMODB_TABLE_NAME = os.environ.get('DYNAMODB_TABLE_NAME')
 CANARY_GMAIL_LABEL = os.environ.get('CANARY_GMAIL_LABEL')  # Required for canary: Gmail label name
 ENVIRONMENT = os.environ.get('ENVIRONMENT', 'unknown')
+# Record a dedicated X-Ray subsegment with size/label annotations for each Gmail import.
+# The patched requests library already traces the HTTP call itself.
+XRAY_DETAILED_TRACING = os.environ.get('XRAY_DETAILED_TRACING', 'false').lower() == 'true'
 S3_PREFIX = 'emails'  # Hardcoded to match ses.tf configuration
 GMAIL_USER_ID = 'me'
+GMAIL_UPLOAD_BASE_URL = 'https://gmail.googleapis.com/upload/gmail/v1'
+GMAIL_IMPORT_URL = f'{GMAIL_UPLOAD_BASE_URL}/users/{GMAIL_USER_ID}/messages/import'
+GMAIL_IMPORT_PARAMS = {'uploadType': 'multipart', 'internalDateSource': 'receivedTime'}
+GMAIL_API_TIMEOUT = 30  # Seconds
+REFRESH_TOKEN_CACHE_TTL = 300  # Seconds to reuse the refresh token loaded from SSM
+EMAIL_SPOOL_MAX_MEMORY = 8 * 1024 * 1024  # Bytes held in memory before spooling to /tmp
+ACCESS_TOKEN_EXPIRY_MARGIN = timedelta(minutes=5)  # Refresh cached access tokens this long before expiry
 DEFAULT_LABEL_IDS = ['INBOX', 'UNREAD']
+# Error message keywords that indicate an expired or invalid OAuth token
+TOKEN_EXPIRED_PATTERN = re.compile(
+    r'invalid_grant|token has been expired|token expired|invalid credentials'
+    r'|credentials have expired|unauthorized|authentication failed',
+    re.IGNORECASE
+)
 
 # X-Ray HTTP metadata keys (matching aws_xray_sdk.core.models.http)
 XRAY_HTTP_URL = "url"
 XRAY_HTTP_METHOD = "method"
 XRAY_HTTP_STATUS = "status"
 
+# Shared AWS client configuration: standard retry mode with a small retry budget,
+# TCP keep-alive for connection reuse across warm invocations, and explicit timeouts
+AWS_CLIENT_CONFIG = Config(
+    retries={'max_attempts': 3, 'mode': 'standard'},
+    tcp_keepalive=True,
+    max_pool_connections=32,
+    connect_timeout=2,
+    read_timeout=10
+)
+
 # Initialize AWS clients
-s3_client = boto3.client('s3')
-ssm_client = boto3.client('ssm')
-sqs_client = boto3.client('sqs')
-cloudwatch = boto3.client('cloudwatch')
-dynamodb_client = boto3.client('dynamodb')
+s3_client = boto3.client('s3', config=AWS_CLIENT_CONFIG)
+ssm_client = boto3.client('ssm', config=AWS_CLIENT_CONFIG)
+sqs_client = boto3.client('sqs', config=AWS_CLIENT_CONFIG)
+dynamodb_client = boto3.client('dynamodb', config=AWS_CLIENT_CONFIG)
+
+# Background thread pool used to start S3 fetches early, overlapping them with
+# credential refresh and SQS record parsing
+_s3_prefetch_executor = ThreadPoolExecutor(max_workers=4)
+
+# OAuth secrets cached across warm invocations (in memory only - never written to /tmp)
+# Refresh token: (cache expiry epoch, token). Client credentials: kept until a refresh fails.
+_refresh_token_cache: tuple[float, str] | None = None
+_client_credentials_cache: Dict[str, str] | None = None
+
+# Gmail credentials (with access token) cached across warm invocations
+_gmail_creds: 'Credentials | None' = None
+
+# Custom metrics are emitted as CloudWatch Embedded Metric Format (EMF) logs.
+# No service is set so the metrics stay dimensionless, matching the alarms and dashboard.
+metrics = Metrics(namespace=f'SESMail/{ENVIRONMENT}')
+
+# Batch processor for SQS partial batch responses.
+# A fully failed batch is reported via batchItemFailures rather than raising, as before.
+processor = BatchProcessor(event_type=EventType.SQS, raise_on_entire_batch_failure=False)
+
+# HTTP session for Google OAuth and Gmail API calls
+# (keeps connections alive across records and warm invocations)
+gmail_session = requests.Session()
+gmail_session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=10))
+
+
+class RecordProcessingError(RuntimeError):
+    """Raised by record_handler so the batch processor reports the record as failed"""
+
+
+class GmailApiError(RuntimeError):
+    """Raised when the Gmail API returns an error response"""
+
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
 
 
 def extract_subject(ses_message: Dict[str, Any], max_length: int = 64) -> str:
@@ -108,8 +183,6 @@ def write_canary_completion_record(canary_id: str, gmail_message_id: str, status
         logger.warning("DYNAMODB_TABLE_NAME not set, skipping canary completion write")
         return
 
-    from datetime import datetime, timezone
-
     logger.info("Writing canary completion record",
         canary_id=canary_id,
         status=status,
@@ -158,6 +231,7 @@ def write_canary_completion_record(canary_id: str, gmail_message_id: str, status
         # Don't raise - canary tracking is best-effort
 
 
+@metrics.log_metrics
 def lambda_handler(event, context):
     """
     Lambda handler for processing enriched email messages from SQS.
@@ -168,95 +242,118 @@ def lambda_handler(event, context):
         context: Lambda context object
 
     Returns:
-        dict: Response with results for each processed message
+        dict: Response with batchItemFailures for records that failed
     """
-    _ = context  # Unused but required by Lambda handler signature
-    logger.info("Received SQS event", extra={"messageCount": len(event.get('Records', []))})
+    logger.debug("Received SQS event", extra={"messageCount": len(event.get('Records', []))})
 
-    results = []
-    service = None
-    success_count = 0
-    failure_count = 0
+    # Start fetching the first email from S3 before getting credentials, so an OAuth
+    # refresh (cold start or near token expiry) overlaps with the S3 round trip
+    records = event.get('Records', [])
+    prefetched = {}
+    if records:
+        prefetched[records[0].get('messageId')] = prefetch_email_stream(records[0])
 
     try:
-        # Build Gmail service with fresh access token
-        service = build_gmail_service()
-
-        # Process each SQS record
-        records = event.get('Records', [])
-        for record in records:
-            result = process_sqs_record(record, service)
-            results.append(result)
-
-            # Track success/failure counts
-            if result.get('status') == 'ok':
-                success_count += 1
-            else:
-                failure_count += 1
+        try:
+            # Get Gmail credentials (reused across warm invocations until near expiry)
+            creds, creds_reused = get_gmail_credentials()
+
+        except Exception as e:
+            # Check if this is a token expiration error during token generation
+            if is_token_expired_error(e):
+                logger.warning("Token expired during token generation - queueing all records for retry", extra={
+                    "error": str(e),
+                    "recordCount": len(event.get('Records', []))
+                })
+
+                # Queue all SQS records for retry
+                error_context = {
+                    'timestamp': datetime.now(timezone.utc).isoformat(),
+                    'error_type': 'token_expired',
+                    'request_id': context.aws_request_id if context else 'unknown',
+                    'attempt_count': 1
+                }
+
+                batch_item_failures = []
+                records = event.get('Records', [])
+                for record in records:
+                    sqs_message_id = record.get('messageId')
+                    try:
+                        queue_for_retry(record, error_context)
+                        # Successfully queued - do NOT add to batch failures
+                        # This lets SQS delete the message from the original queue
+                        logger.info("Successfully queued message for retry - allowing SQS to delete from source queue", extra={
+                            "sqsMessageId": sqs_message_id
+                        })
+                    except Exception as queue_error:
+                        logger.error("Failed to queue message for retry - adding to batch failures for SQS retry", extra={
+                            "sqsMessageId": sqs_message_id,
+                            "queueError": str(queue_error)
+                        })
+                        # Only add to failures if we FAILED to queue for retry
+                        # This will cause SQS to retry, which will attempt to queue again
+                        batch_item_failures.append({'itemIdentifier': sqs_message_id})
+
+                return {
+                    'statusCode': HTTPStatus.OK,
+                    'batchItemFailures': batch_item_failures
+                }
+
+            # Not a token expiration error - log and re-raise
+            logger.exception("Error processing SQS messages", extra={"error": str(e)})
+            raise
+
+        # Process each SQS record; failed records are reported in batchItemFailures by SQS messageId
+        response = process_partial_response(
+            event=event,
+            record_handler=functools.partial(record_handler, creds=creds, creds_reused=creds_reused, prefetched=prefetched),
+            processor=processor,
+            context=context
+        )
+
+        success_count = len(processor.success_messages)
+        failure_count = len(processor.fail_messages)
 
         # Publish custom metrics
         publish_metrics(success_count, failure_count)
 
         logger.info("Processed messages", extra={
-            "totalCount": len(results),
+            "totalCount": success_count + failure_count,
             "successCount": success_count,
             "failureCount": failure_count
         })
 
         return {
             'statusCode': HTTPStatus.OK,
-            'batchItemFailures': [
-                {'itemIdentifier': r['receiptHandle']}
-                for r in results
-                if r.get('status') == 'error'
-            ]
+            **response
         }
+    finally:
+        # Close any prefetched S3 streams that no record consumed (early return or error)
+        for s3_prefetch in prefetched.values():
+            discard_email_prefetch(s3_prefetch)
 
-    except Exception as e:
-        # Check if this is a token expiration error during service creation
-        if is_token_expired_error(e):
-            logger.warning("Token expired during service creation - queueing all records for retry", extra={
-                "error": str(e),
-                "recordCount": len(event.get('Records', []))
-            })
 
-            # Queue all SQS records for retry
-            from datetime import datetime, timezone
-            error_context = {
-                'timestamp': datetime.now(timezone.utc).isoformat(),
-                'error_type': 'token_expired',
-                'request_id': context.aws_request_id if context else 'unknown',
-                'attempt_count': 1
-            }
+def record_handler(record: SQSRecord, creds, creds_reused: bool,
+                   prefetched: Dict[str, Future | None]) -> Dict[str, Any]:
+    """
+    Batch processor handler for a single SQS record.
 
-            batch_item_failures = []
-            records = event.get('Records', [])
-            for record in records:
-                receipt_handle = record.get('receiptHandle')
-                try:
-                    queue_for_retry(record, error_context)
-                    # Successfully queued - do NOT add to batch failures
-                    # This lets SQS delete the message from the original queue
-                    logger.info("Successfully queued message for retry - allowing SQS to delete from source queue", extra={
-                        "receiptHandle": receipt_handle
-                    })
-                except Exception as queue_error:
-                    logger.error("Failed to queue message for retry - adding to batch failures for SQS retry", extra={
-                        "receiptHandle": receipt_handle,
-                        "queueError": str(queue_error)
-                    })
-                    # Only add to failures if we FAILED to queue for retry
-                    # This will cause SQS to retry, which will attempt to queue again
-                    batch_item_failures.append({'itemIdentifier': receipt_handle})
+    Args:
+        record: SQS record from the event
+        creds: Google OAuth credentials with a valid access token
+        creds_reused: True if creds were cached from a previous invocation
+        prefetched: S3 fetches already started by the handler, keyed by SQS messageId
 
-            return {
-                'statusCode': HTTPStatus.OK,
-                'batchItemFailures': batch_item_failures
-            }
+    Returns:
+        dict: Result from process_sqs_record
 
-        # Not a token expiration error - log and re-raise
-        logger.exception("Error processing SQS messages", extra={"error": str(e)})
-        raise
+    Raises:
+        RecordProcessingError: If the record failed, so it is reported in batchItemFailures
+    """
+    result = process_sqs_record(record.raw_event, creds, prefetched.pop(record.message_id, None), creds_reused)
+    if result.get('status') != 'ok':
+        raise RecordProcessingError(result.get('error', 'Unknown error'))
+    return result
 
 
 def is_token_expired_error(exception: Exception) -> bool:
@@ -265,7 +362,7 @@ def is_token_expired_error(exception: Exception) -> bool:
 
     Checks for various error types and messages that indicate the Gmail OAuth
     token has expired or is invalid:
-    - HTTP 401 (Unauthorized) or 403 (Forbidden) errors
+    - HTTP 401 (Unauthorized) errors
     - RefreshError from Google Auth library
     - Error messages containing token expiration keywords
 
@@ -277,43 +374,35 @@ def is_token_expired_error(exception: Exception) -> bool:
     """
     # Check for RefreshError from Google Auth library
     if isinstance(exception, RefreshError):
-        logger.info("Detected RefreshError - token has expired")
+        logger.debug("Detected RefreshError - token has expired")
         return True
 
-    # Check for HTTP errors with 401/403 status codes
-    if isinstance(exception, HttpError):
-        status_code = exception.resp.status
-        if status_code in (HTTPStatus.UNAUTHORIZED, HTTPStatus.FORBIDDEN):
-            logger.info("Detected HTTP 401/403 error - token may be expired", extra={
-                "status_code": status_code,
+    # Only a 401 from the Gmail API means the token was rejected. 403 covers
+    # rate limits (rateLimitExceeded, userRateLimitExceeded) and missing scopes,
+    # which a token refresh cannot fix, so they stay ordinary retryable failures
+    if isinstance(exception, GmailApiError):
+        if exception.status_code == HTTPStatus.UNAUTHORIZED:
+            logger.debug("Detected HTTP 401 error - token may be expired", extra={
+                "status_code": exception.status_code,
                 "error": str(exception)
             })
             return True
+        return False
 
     # Check error message for token expiration keywords
-    error_message = str(exception).lower()
-    expiration_keywords = [
-        'invalid_grant',
-        'token has been expired',
-        'token expired',
-        'invalid credentials',
-        'credentials have expired',
-        'unauthorized',
-        'authentication failed'
-    ]
-
-    for keyword in expiration_keywords:
-        if keyword in error_message:
-            logger.info("Detected token expiration keyword in error message", extra={
-                "keyword": keyword,
-                "error": str(exception)
-            })
-            return True
+    error_message = str(exception)
+    match = TOKEN_EXPIRED_PATTERN.search(error_message)
+    if match:
+        logger.debug("Detected token expiration keyword in error message", extra={
+            "keyword": match.group(0).lower(),
+            "error": error_message
+        })
+        return True
 
     return False
 
 
-def queue_for_retry(sqs_record: Dict[str, Any], error_context: Dict[str, Any]) -> None:
+def queue_for_retry(sqs_record: Dict[str, Any], error_context: Dict[str, Any], message_id: str | None = None) -> None:
     """
     Queue a failed SQS record to the retry queue for later processing.
 
@@ -323,6 +412,7 @@ def queue_for_retry(sqs_record: Dict[str, Any], error_context: Dict[str, Any]) -
     Args:
         sqs_record: The original SQS record from the Lambda event
         error_context: Additional error information (error_type, timestamp, etc.)
+        message_id: SES message ID if the caller already parsed it (avoids re-parsing the body)
 
     Raises:
         RuntimeError: If queueing fails
@@ -330,13 +420,12 @@ def queue_for_retry(sqs_record: Dict[str, Any], error_context: Dict[str, Any]) -
     if not RETRY_QUEUE_URL:
         raise RuntimeError("RETRY_QUEUE_URL environment variable must be set")
 
-    message_id = None
-
     try:
-        # Parse the SQS message body to extract message ID for logging
-        body = json.loads(sqs_record.get('body', '{}'))
-        detail = body.get('detail', body)
-        message_id = detail.get('originalMessageId', 'unknown')
+        if message_id is None:
+            # Parse the SQS message body to extract message ID for logging
+            body = json.loads(sqs_record.get('body', '{}'))
+            detail = body.get('detail', body)
+            message_id = detail.get('originalMessageId', 'unknown')
 
         # Prepare SQS message with original SQS message body
         message_body = sqs_record.get('body', '{}')
@@ -384,19 +473,84 @@ def queue_for_retry(sqs_record: Dict[str, Any], error_context: Dict[str, Any]) -
         raise RuntimeError(f"Failed to queue message for retry: {e}")
 
 
-def process_sqs_record(record, service):
+def parse_enriched_record(record: Dict[str, Any]) -> tuple[Dict[str, Any], str | None, List[Dict[str, Any]]]:
+    """
+    Parse the enriched EventBridge event carried in an SQS record.
+
+    Args:
+        record: SQS record from the event
+
+    Returns:
+        tuple: (detail, message_id, targets)
+            - detail: Router output (EventBridge event detail)
+            - message_id: SES message ID, or None if missing
+            - targets: forward-to-gmail targets, empty if none
+    """
+    # Parse SQS message body (enriched EventBridge message from EventBridge Event Bus)
+    body = json.loads(record.get('body', '{}'))
+
+    # EventBridge wraps the router output in 'detail'
+    detail = body.get('detail', body)  # Fallback to body if not wrapped
+
+    # Extract actions and targets from new router structure
+    forward_to_gmail = detail.get('actions', {}).get('forward-to-gmail', {})
+
+    return detail, detail.get('originalMessageId'), forward_to_gmail.get('targets', [])
+
+
+def prefetch_email_stream(record: Dict[str, Any]) -> Future | None:
+    """
+    Start fetching the email for an SQS record from S3 in the background.
+
+    Args:
+        record: SQS record from the event
+
+    Returns:
+        Future: Resolves to get_email_stream_from_s3() output, or None if the record
+            has nothing to fetch (process_sqs_record reports why)
+    """
+    try:
+        _, message_id, targets = parse_enriched_record(record)
+    except (ValueError, TypeError, AttributeError):
+        # Malformed record - process_sqs_record fails it with the real error
+        return None
+
+    if not message_id or not targets:
+        return None
+
+    return _s3_prefetch_executor.submit(get_email_stream_from_s3, message_id)
+
+
+def discard_email_prefetch(s3_prefetch: Future | None) -> None:
+    """
+    Cancel an S3 prefetch that will not be used, closing its stream if already fetched.
+
+    Args:
+        s3_prefetch: S3 fetch started by prefetch_email_stream, or None
+    """
+    if s3_prefetch is None or s3_prefetch.cancel():
+        return
+    try:
+        s3_prefetch.result()[1].close()
+    except Exception:
+        # A failed fetch has no stream to close
+        pass
+
+
+def process_sqs_record(record, creds, s3_prefetch: Future | None = None, creds_reused: bool = False):
     """
     Process a single SQS record containing an enriched email message.
 
     Args:
         record: SQS record from the event
-        service: Authenticated Gmail API service
+        creds: Google OAuth credentials with a valid access token
+        s3_prefetch: S3 fetch for this record already started by prefetch_email_stream
+        creds_reused: True if creds were cached from a previous invocation, so a rejected
+            access token is retried with a new one instead of being queued for retry
 
     Returns:
         dict: Result with messageId, gmail_id, and status
     """
-    receipt_handle = record.get('receiptHandle')
-
     # Create X-Ray subsegment at the beginning so it's accessible in except block
     subsegment = xray_recorder.begin_subsegment('process_gmail_forward')  # type: ignore[attr-defined]
 
@@ -407,46 +561,41 @@ def process_sqs_record(record, service):
     recipient = None
     destination = None
     subject = None
+    email_size, email_stream = 0, None
 
     try:
-
-        # Parse SQS message body (enriched EventBridge message from EventBridge Event Bus)
-        # The message is the EventBridge event detail
-        body = json.loads(record.get('body', '{}'))
-
-        # EventBridge wraps the router output in 'detail'
-        detail = body.get('detail', body)  # Fallback to body if not wrapped
-
-        # Extract message ID from detail
-        message_id = detail.get('originalMessageId')
-
-        # Extract actions and targets from new router structure
-        actions = detail.get('actions', {})
-        forward_to_gmail = actions.get('forward-to-gmail', {})
-        targets = forward_to_gmail.get('targets', [])
+        detail, message_id, targets = parse_enriched_record(record)
 
         if not targets:
             raise ValueError("No forward-to-gmail targets found in enriched message")
 
-        logger.info("Decision Info", extra=detail)
+        if not message_id:
+            raise ValueError("Missing originalMessageId in enriched message")
+
+        # Start fetching the email now (unless already started), so the S3 round trip
+        # overlaps with the logging and X-Ray setup below
+        if s3_prefetch is None:
+            s3_prefetch = _s3_prefetch_executor.submit(get_email_stream_from_s3, message_id)
+
+        logger.debug("Decision Info", extra=detail)
         ses_message = detail.get('ses')
 
         # Extract SES mail metadata
         ses_mail = ses_message.get('mail', {})
         source = ses_mail.get('source', 'unknown@unknown.com')
         subject = ses_mail.get('commonHeaders', {}).get('subject', '(no subject)')
+        result_subject = extract_subject(ses_message, max_length=64)
 
-        if not message_id:
-            raise ValueError("Missing originalMessageId in enriched message")
-
-        # Fetch raw email from S3 once before processing targets
-        raw_eml = fetch_raw_email_from_s3(message_id)
-        logger.info("Fetched email from S3", extra={
-            "messageId": message_id,
-            "byteCount": len(raw_eml)
-        })
+        # Add target-independent X-Ray annotations once for the record
+        if subsegment:
+            subsegment.put_annotation('messageId', message_id)
+            subsegment.put_annotation('source', source)
+            subsegment.put_annotation('action', 'forward-to-gmail')
+            subsegment.put_annotation('subject', subject[0:64])
 
         # Process each target (typically one, but could be multiple)
+        # Note: The S3 stream can only be consumed once. With a single target it is
+        # uploaded directly; with multiple targets it is spooled once and rewound.
         results = []
         for target_info in targets:
             recipient = target_info.get('target')  # Original recipient email
@@ -459,19 +608,15 @@ def process_sqs_record(record, service):
 
             # Add X-Ray annotations for searchability and correlation
             if subsegment:
-                subsegment.put_annotation('messageId', message_id)
-                subsegment.put_annotation('source', source)
-                subsegment.put_annotation('action', 'forward-to-gmail')
                 subsegment.put_annotation('recipient', recipient)
                 subsegment.put_annotation('target', destination)
-                subsegment.put_annotation('subject', subject[0:64])
                 if is_canary:
                     subsegment.put_annotation('canary', True)
                     if canary_id:
                         subsegment.put_annotation('canary_id', canary_id)
 
             # Log email metadata
-            logger.info("Processing email forward to Gmail",
+            logger.debug("Processing email forward to Gmail",
                 messageId=message_id,
                 sender=source,
                 recipient=recipient,
@@ -481,6 +626,18 @@ def process_sqs_record(record, service):
                 canary_id=canary_id if is_canary else None
             )
 
+            # Get email stream from S3 (prefetched above), or rewind the spooled copy
+            if email_stream is None:
+                email_size, email_stream = s3_prefetch.result()
+                if len(targets) > 1:
+                    email_stream = spool_email_stream(email_stream)
+                logger.debug("Got email stream from S3", extra={
+                    "messageId": message_id,
+                    "byteCount": email_size
+                })
+            else:
+                email_stream.seek(0)
+
             # For canary emails, wrap everything in try/catch to detect failures
             canary_success = False
             canary_error = None
@@ -499,13 +656,13 @@ def process_sqs_record(record, service):
 
                     # Remove INBOX/UNREAD, use only the canary label
                     label_ids = [CANARY_GMAIL_LABEL]
-                    logger.info("Canary email - using label from environment",
+                    logger.debug("Canary email - using label from environment",
                         canary_id=canary_id,
                         label=CANARY_GMAIL_LABEL
                     )
 
                 # Import into Gmail with appropriate labels
-                gmail_response = gmail_import(service, raw_eml, label_ids)
+                gmail_response = gmail_import(creds, email_size, email_stream, label_ids)
 
                 # If we got here without exception, canary succeeded
                 if is_canary:
@@ -557,7 +714,7 @@ def process_sqs_record(record, service):
             logger.info("Action result", extra={
                 "messageId": message_id,
                 "sender": source,
-                "subject": extract_subject(ses_message, max_length=64),
+                "subject": result_subject,
                 "recipient": recipient,
                 "action": "forward-to-gmail",
                 "result": "success",
@@ -582,19 +739,38 @@ def process_sqs_record(record, service):
         return {
             'messageId': message_id,
             'results': results,
-            'status': 'ok',
-            'receiptHandle': receipt_handle
+            'status': 'ok'
         }
 
-    except (RuntimeError, ValueError, HttpError, ClientError, json.JSONDecodeError, RefreshError) as e:
+    except (RuntimeError, ValueError, ClientError, json.JSONDecodeError, RefreshError) as e:
+        # A cached access token can be revoked before it expires. Drop it and let SQS
+        # redeliver the record, which gets a new token, rather than parking the message
+        # on the retry queue until the refresh token is replaced by hand
+        if creds_reused and is_token_expired_error(e):
+            logger.warning("Cached access token rejected - discarding it so SQS redelivers the record", extra={
+                "error": str(e)
+            })
+            invalidate_gmail_credentials()
+
+            if subsegment:
+                subsegment.put_annotation('import_status', 'error')
+                subsegment.put_annotation('error_type', 'cached_token_rejected')
+
+            return {
+                'error': f"Cached access token rejected: {e}",
+                'status': 'error'
+            }
+
         # Check if this is a token expiration error
         if is_token_expired_error(e):
             logger.warning("Token expired while processing message - queueing for retry", extra={
                 "error": str(e)
             })
 
+            # Don't reuse the rejected access token for later records or invocations
+            invalidate_gmail_credentials()
+
             # Queue the message for retry with error context
-            from datetime import datetime, timezone
             error_context = {
                 'timestamp': datetime.now(timezone.utc).isoformat(),
                 'error_type': 'token_expired',
@@ -603,7 +779,7 @@ def process_sqs_record(record, service):
             }
 
             try:
-                queue_for_retry(record, error_context)
+                queue_for_retry(record, error_context, message_id)
 
                 # Add success details to X-Ray subsegment
                 if subsegment:
@@ -611,12 +787,11 @@ def process_sqs_record(record, service):
                     subsegment.put_annotation('error_type', 'token_expired')
 
                 # Successfully queued - return 'ok' status so SQS deletes from original queue
-                # Do NOT return 'error' status as that adds to batchItemFailures and causes SQS to retry
+                # Do NOT return 'error' status as record_handler reports that in batchItemFailures and SQS retries
                 return {
                     'status': 'ok',
                     'action': 'queued_for_retry',
-                    'reason': 'Token expired - successfully queued for retry after token refresh',
-                    'receiptHandle': receipt_handle
+                    'reason': 'Token expired - successfully queued for retry after token refresh'
                 }
             except Exception as queue_error:
                 logger.error("Failed to queue message for retry - will be added to batch failures", extra={
@@ -630,11 +805,10 @@ def process_sqs_record(record, service):
                     subsegment.put_annotation('error_type', 'failed_to_queue')
 
                 # Only return error if we FAILED to queue for retry
-                # This will be added to batchItemFailures, causing SQS to retry
+                # record_handler adds this to batchItemFailures, causing SQS to retry
                 return {
                     'error': f"Token expired and failed to queue: {queue_error}",
-                    'status': 'error',
-                    'receiptHandle': receipt_handle
+                    'status': 'error'
                 }
 
         # Not a token expiration error - log and return error
@@ -663,56 +837,115 @@ def process_sqs_record(record, service):
 
         return {
             'error': str(e),
-            'status': 'error',
-            'receiptHandle': receipt_handle
+            'status': 'error'
         }
     finally:
+        # Release the S3 stream (or the unused prefetch) whether or not the import succeeded
+        if email_stream is not None:
+            email_stream.close()
+        else:
+            discard_email_prefetch(s3_prefetch)
+
         # Always end the subsegment
         xray_recorder.end_subsegment()
 
 
-def load_refresh_token_from_ssm() -> str:
+def load_oauth_secrets_from_ssm() -> tuple[str, Dict[str, str]]:
     """
-    Load the Gmail OAuth refresh token from SSM Parameter Store.
+    Load the Gmail OAuth refresh token and client credentials from SSM Parameter Store.
+
+    Both parameters are fetched with a single GetParameters call, skipping any that
+    are cached. The refresh token is cached for REFRESH_TOKEN_CACHE_TTL seconds (never
+    past its own expiry); the short TTL means a token replaced with
+    refresh_oauth_token.py is picked up within minutes. The client credentials do not
+    rotate, so they are cached until a token refresh fails.
 
     Returns:
-        str: Refresh token string
+        tuple: (refresh_token, client_credentials)
+            - refresh_token: Refresh token string
+            - client_credentials: Dictionary with client_id, client_secret, and token_uri
     """
+    global _refresh_token_cache, _client_credentials_cache
+
     if not GMAIL_REFRESH_TOKEN_PARAMETER:
         raise RuntimeError("GMAIL_REFRESH_TOKEN_PARAMETER environment variable must be set")
+    if not GMAIL_CLIENT_CREDENTIALS_PARAMETER:
+        raise RuntimeError("GMAIL_CLIENT_CREDENTIALS_PARAMETER environment variable must be set")
+
+    refresh_token = None
+    if _refresh_token_cache is not None and time.time() < _refresh_token_cache[0]:
+        refresh_token = _refresh_token_cache[1]
+
+    client_creds = _client_credentials_cache
+
+    names = []
+    if refresh_token is None:
+        names.append(GMAIL_REFRESH_TOKEN_PARAMETER)
+    if client_creds is None:
+        names.append(GMAIL_CLIENT_CREDENTIALS_PARAMETER)
+
+    if not names:
+        return refresh_token, client_creds
 
     try:
-        response = ssm_client.get_parameter(
-            Name=GMAIL_REFRESH_TOKEN_PARAMETER,
-            WithDecryption=True
-        )
-        token_data = json.loads(response['Parameter']['Value'])
-        return token_data['token']
+        response = ssm_client.get_parameters(Names=names, WithDecryption=True)
     except ClientError as e:
-        logger.error("Error retrieving refresh token from SSM", extra={"error": str(e)})
-        raise RuntimeError(f"Failed to load refresh token from SSM: {e}")
+        logger.error("Error retrieving OAuth parameters from SSM", extra={"error": str(e)})
+        raise RuntimeError(f"Failed to load OAuth parameters from SSM: {e}")
+
+    invalid = response.get('InvalidParameters', [])
+    if invalid:
+        raise RuntimeError(f"Failed to load OAuth parameters from SSM: not found: {', '.join(invalid)}")
+
+    values = {param['Name']: param['Value'] for param in response['Parameters']}
+
+    if refresh_token is None:
+        refresh_token, cache_expiry = parse_refresh_token(values[GMAIL_REFRESH_TOKEN_PARAMETER])
+        _refresh_token_cache = (cache_expiry, refresh_token)
+
+    if client_creds is None:
+        client_creds = parse_client_credentials(values[GMAIL_CLIENT_CREDENTIALS_PARAMETER])
+        _client_credentials_cache = client_creds
+
+    return refresh_token, client_creds
+
+
+def parse_refresh_token(value: str) -> tuple[str, float]:
+    """
+    Parse the refresh token parameter stored by refresh_oauth_token.py.
+
+    Args:
+        value: Decrypted parameter value (JSON with token and expiry metadata)
+
+    Returns:
+        tuple: (refresh_token, cache_expiry_epoch)
+    """
+    try:
+        token_data = json.loads(value)
+        refresh_token = token_data['token']
     except (KeyError, json.JSONDecodeError) as e:
         logger.error("Invalid refresh token format in SSM", extra={"error": str(e)})
         raise RuntimeError(f"Invalid refresh token format: {e}")
 
+    cache_expiry = time.time() + REFRESH_TOKEN_CACHE_TTL
+    if 'expires_at_epoch' in token_data:
+        cache_expiry = min(cache_expiry, token_data['expires_at_epoch'] - 60)
+
+    return refresh_token, cache_expiry
+
 
-def load_client_credentials_from_ssm() -> Dict[str, str]:
+def parse_client_credentials(value: str) -> Dict[str, str]:
     """
-    Load OAuth client credentials from SSM Parameter Store.
+    Parse the OAuth client credentials parameter.
+
+    Args:
+        value: Decrypted parameter value (Google OAuth client JSON)
 
     Returns:
         dict: Dictionary with client_id, client_secret, and token_uri
     """
-    if not GMAIL_CLIENT_CREDENTIALS_PARAMETER:
-        raise RuntimeError("GMAIL_CLIENT_CREDENTIALS_PARAMETER environment variable must be set")
-
     try:
-        response = ssm_client.get_parameter(
-            Name=GMAIL_CLIENT_CREDENTIALS_PARAMETER,
-            WithDecryption=True
-        )
-        credentials_json = response['Parameter']['Value']
-        credentials_data = json.loads(credentials_json)
+        credentials_data = json.loads(value)
 
         # Handle Google's OAuth JSON format (may have 'installed' or 'web' wrapper)
         if 'installed' in credentials_data:
@@ -727,15 +960,55 @@ def load_client_credentials_from_ssm() -> Dict[str, str]:
             'client_secret': creds['client_secret'],
             'token_uri': creds['token_uri']
         }
-    except ClientError as e:
-        logger.error("Error retrieving client credentials from SSM", extra={"error": str(e)})
-        raise RuntimeError(f"Failed to load client credentials from SSM: {e}")
     except (KeyError, json.JSONDecodeError, ValueError) as e:
         logger.error("Invalid client credentials format in SSM", extra={"error": str(e)})
         raise RuntimeError(f"Invalid client credentials format: {e}")
 
 
-def generate_access_token() -> Credentials:
+def invalidate_oauth_secrets_cache() -> None:
+    """
+    Drop the cached refresh token and client credentials so the next load reads them from SSM again.
+    """
+    global _refresh_token_cache, _client_credentials_cache
+    _refresh_token_cache = None
+    _client_credentials_cache = None
+
+
+def get_gmail_credentials() -> tuple['Credentials', bool]:
+    """
+    Get Gmail credentials with a valid access token, reusing them across warm invocations.
+
+    Access tokens last about an hour, so the cached credentials are only replaced
+    once they are within ACCESS_TOKEN_EXPIRY_MARGIN of expiring.
+
+    Returns:
+        tuple: (Google OAuth credentials with a valid access token,
+            True if they were cached from a previous invocation)
+
+    Raises:
+        RuntimeError: If token generation fails
+    """
+    global _gmail_creds
+
+    if _gmail_creds is not None and _gmail_creds.expiry is not None:
+        # google-auth stores expiry as a naive UTC datetime
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        if _gmail_creds.expiry - now > ACCESS_TOKEN_EXPIRY_MARGIN:
+            return _gmail_creds, True
+
+    _gmail_creds = generate_access_token()
+    return _gmail_creds, False
+
+
+def invalidate_gmail_credentials() -> None:
+    """
+    Drop the cached Gmail credentials so the next invocation generates a new access token.
+    """
+    global _gmail_creds
+    _gmail_creds = None
+
+
+def generate_access_token() -> 'Credentials':
     """
     Generate a fresh access token from the refresh token stored in SSM.
 
@@ -744,79 +1017,83 @@ def generate_access_token() -> Credentials:
     The refresh token is never modified - we simply use it to obtain a new
     short-lived access token for this session.
 
+    If the refresh is rejected while using cached OAuth secrets, they are
+    reloaded from SSM and the refresh is retried once, in case either was replaced.
+
     Returns:
         Credentials: Google OAuth credentials with fresh access token
 
     Raises:
         RuntimeError: If token generation fails
     """
-    try:
-        # Load refresh token and client credentials from SSM
-        refresh_token = load_refresh_token_from_ssm()
-        client_creds = load_client_credentials_from_ssm()
-
-        logger.info("Generating fresh access token from refresh token")
-
-        # Create credentials object with refresh token and client info
-        creds = Credentials(
-            token=None,  # No access token yet
-            refresh_token=refresh_token,
-            token_uri=client_creds['token_uri'],
-            client_id=client_creds['client_id'],
-            client_secret=client_creds['client_secret']
-        )
-
-        # Refresh to obtain new access token
-        creds.refresh(Request())
-
-        logger.info("Successfully generated fresh access token", extra={
-            "token_expiry": creds.expiry.isoformat() if creds.expiry else None
-        })
+    used_cached_secrets = _refresh_token_cache is not None or _client_credentials_cache is not None
 
-        return creds
+    try:
+        try:
+            return refresh_access_token()
+        except RefreshError as e:
+            if not used_cached_secrets:
+                raise
+            logger.warning("Token refresh failed with cached OAuth secrets - reloading from SSM", extra={
+                "error": str(e)
+            })
+            invalidate_oauth_secrets_cache()
+            return refresh_access_token()
 
     except Exception as e:
+        # The cached secrets may have been revoked or replaced - reload them next time
+        invalidate_oauth_secrets_cache()
         logger.error("Failed to generate access token", extra={"error": str(e)})
         raise RuntimeError(f"Failed to generate access token: {e}")
 
 
-def build_gmail_service():
+def refresh_access_token() -> 'Credentials':
     """
-    Create Gmail API service with a fresh access token.
-
-    Generates a new access token from the refresh token and builds the Gmail API service.
-    Each invocation creates a fresh access token, ensuring we always have valid credentials.
+    Exchange the refresh token for a new access token with Google's OAuth API.
 
     Returns:
-        Gmail API service object
-
-    Raises:
-        RuntimeError: If service creation fails
+        Credentials: Google OAuth credentials with fresh access token
     """
-    try:
-        # Generate fresh access token
-        creds = generate_access_token()
+    # Imported here to keep the Google OAuth modules out of the cold start path
+    from google.oauth2.credentials import Credentials
+    from google.auth.transport.requests import Request
+
+    # Load refresh token and client credentials from SSM
+    refresh_token, client_creds = load_oauth_secrets_from_ssm()
+
+    logger.debug("Generating fresh access token from refresh token")
+
+    # Create credentials object with refresh token and client info
+    creds = Credentials(
+        token=None,  # No access token yet
+        refresh_token=refresh_token,
+        token_uri=client_creds['token_uri'],
+        client_id=client_creds['client_id'],
+        client_secret=client_creds['client_secret']
+    )
 
-        # Build Gmail service with the fresh credentials
-        service = build('gmail', 'v1', credentials=creds, cache_discovery=False)
+    # Refresh to obtain new access token (over the shared keep-alive session)
+    creds.refresh(Request(session=gmail_session))
 
-        logger.info("Gmail service built successfully")
-        return service
+    logger.debug("Successfully generated fresh access token", extra={
+        "token_expiry": creds.expiry.isoformat() if creds.expiry else None
+    })
 
-    except Exception as e:
-        logger.error("Error building Gmail service", extra={"error": str(e)})
-        raise RuntimeError(f"Failed to build Gmail service: {e}")
+    return creds
 
 
-def fetch_raw_email_from_s3(message_id: str) -> bytes:
+def get_email_stream_from_s3(message_id: str) -> tuple[int, Any]:
     """
-    Download the raw email bytes from S3 for the given SES messageId.
+    Get email size and streaming body from S3 for the given SES messageId.
+    Returns a stream that can be uploaded to Gmail without loading into memory.
 
     Args:
         message_id: SES message ID
 
     Returns:
-        bytes: Raw email content in MIME format
+        tuple: (content_length, streaming_body)
+            - content_length: Size of the email in bytes
+            - streaming_body: File-like S3 StreamingBody object
     """
     if not EMAIL_BUCKET:
         raise RuntimeError("EMAIL_BUCKET environment variable must be set")
@@ -825,177 +1102,180 @@ def fetch_raw_email_from_s3(message_id: str) -> bytes:
     s3_key = f"{S3_PREFIX}/{message_id}"
 
     try:
-        logger.info("Fetching email from S3", extra={
+        logger.debug("Getting email stream from S3", extra={
             "bucket": EMAIL_BUCKET,
             "key": s3_key
         })
         obj = s3_client.get_object(Bucket=EMAIL_BUCKET, Key=s3_key)
-        return obj['Body'].read()
+        return obj['ContentLength'], obj['Body']
     except ClientError as e:
         raise RuntimeError(f"Failed to fetch email from S3: {e}")
 
 
-def gmail_import(service, raw_bytes: bytes, label_ids: List[str]) -> Dict[str, Any]:
+def spool_email_stream(email_stream) -> tempfile.SpooledTemporaryFile:
     """
-    Import raw MIME email into Gmail and apply labels.
+    Copy a single-use S3 stream into a rewindable spooled file.
+
+    Used when an email is imported for multiple targets, so it is only
+    fetched from S3 once. Small emails stay in memory; larger ones spill to /tmp.
 
     Args:
-        service: Gmail API service
-        raw_bytes: Raw email content in MIME format
-        label_ids: List of label IDs to apply (e.g., ['INBOX', 'UNREAD'])
+        email_stream: File-like object (S3 StreamingBody) containing email bytes
 
     Returns:
-        dict: Gmail API response with id, threadId, labelIds
+        SpooledTemporaryFile: Rewound copy of the email
     """
-    # Create X-Ray subsegment for Gmail API HTTP call
-    subsegment = xray_recorder.begin_subsegment('gmail.googleapis.com')
-
-    try:
-        # Mark as external HTTP service
-        if subsegment:
-            subsegment.namespace = 'remote'
-
-        # Prepare request body
-        encoded_email = base64.urlsafe_b64encode(raw_bytes).decode('utf-8')
-        body = {
-            'raw': encoded_email,
-            'labelIds': label_ids or None
-        }
-
-        # Set HTTP request metadata
-        if subsegment:
-            api_url = f'https://gmail.googleapis.com/gmail/v1/users/{GMAIL_USER_ID}/messages/import'
-            subsegment.put_http_meta(XRAY_HTTP_URL, api_url)
-            subsegment.put_http_meta(XRAY_HTTP_METHOD, 'POST')
+    spooled = tempfile.SpooledTemporaryFile(max_size=EMAIL_SPOOL_MAX_MEMORY)
+    shutil.copyfileobj(email_stream, spooled)
+    spooled.seek(0)
+    return spooled
 
-            # Add annotations for tracing
-            subsegment.put_annotation('email_size_bytes', len(raw_bytes))
-            subsegment.put_annotation('email_size_base64', len(encoded_email))
-            subsegment.put_annotation('label_count', len(label_ids) if label_ids else 0)
 
-        # Execute Gmail API call
-        response = service.users().messages().import_(
-            userId=GMAIL_USER_ID,
-            body=body,
-            internalDateSource='receivedTime',
-        ).execute()
-
-        # Set HTTP response metadata
-        if subsegment:
-            subsegment.put_http_meta(XRAY_HTTP_STATUS, HTTPStatus.OK)
-
-            # Add response annotations
-            subsegment.put_annotation('gmail_message_id', response.get('id', 'unknown'))
-            subsegment.put_annotation('gmail_thread_id', response.get('threadId', 'unknown'))
+class StreamingUploadBody:
+    """
+    File-like request body that wraps an email stream between a prefix and suffix.
 
-        return response
+    Used to send the multipart/related Gmail upload straight from the S3 stream.
+    The total length is known up front, so requests sends a Content-Length
+    header rather than using chunked transfer encoding.
+    """
 
-    except HttpError as e:
-        # Capture HTTP error details
-        if subsegment:
-            status_code = e.resp.status if hasattr(e, 'resp') else HTTPStatus.INTERNAL_SERVER_ERROR
-            subsegment.put_http_meta(XRAY_HTTP_STATUS, status_code)
-            subsegment.put_annotation('error', True)
-            subsegment.put_annotation('error_message', str(e))
-        raise RuntimeError(f"Gmail API error: {e}")
-    finally:
-        # Always end the subsegment
-        xray_recorder.end_subsegment()
+    def __init__(self, prefix: bytes, email_stream, email_size: int, suffix: bytes):
+        self._parts = [prefix, email_stream, suffix]
+        self._length = len(prefix) + email_size + len(suffix)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def read(self, size: int = -1) -> bytes:
+        chunks = []
+        while self._parts and size != 0:
+            part = self._parts[0]
+            if isinstance(part, bytes):
+                chunk = part if size < 0 else part[:size]
+                if len(chunk) < len(part):
+                    self._parts[0] = part[len(chunk):]
+                else:
+                    self._parts.pop(0)
+            else:
+                chunk = part.read() if size < 0 else part.read(size)
+                if not chunk:
+                    self._parts.pop(0)
+                    continue
+            chunks.append(chunk)
+            if size > 0:
+                size -= len(chunk)
+        return b''.join(chunks)
 
 
-def get_message_details(service, message_id: str) -> Dict[str, Any]:
+def gmail_import(creds, email_size: int, email_stream, label_ids: List[str]) -> Dict[str, Any]:
     """
-    Get message details from Gmail to verify label assignment.
+    Import raw MIME email into Gmail and apply labels.
+    Uses a multipart/related media upload so the email is sent as message/rfc822
+    straight from the S3 stream, without base64 encoding or loading it into memory.
 
     Args:
-        service: Gmail API service
-        message_id: Gmail message ID
+        creds: Google OAuth credentials with a valid access token
+        email_size: Size of the email in bytes
+        email_stream: File-like object (S3 StreamingBody) containing email bytes
+        label_ids: List of label IDs to apply (e.g., ['INBOX', 'UNREAD'])
 
     Returns:
-        dict: Gmail API response with id, labelIds, threadId
+        dict: Gmail API response with id, threadId, labelIds
     """
-    # Create X-Ray subsegment for Gmail API HTTP call
-    subsegment = xray_recorder.begin_subsegment('gmail.googleapis.com/get')
+    # Create X-Ray subsegment for Gmail API HTTP call (only when detailed tracing is enabled)
+    subsegment = xray_recorder.begin_subsegment('gmail.googleapis.com') if XRAY_DETAILED_TRACING else None
 
     try:
         # Mark as external HTTP service
         if subsegment:
             subsegment.namespace = 'remote'
 
-            # Set HTTP request metadata
-            api_url = f'https://gmail.googleapis.com/gmail/v1/users/{GMAIL_USER_ID}/messages/{message_id}'
-            subsegment.put_http_meta(XRAY_HTTP_URL, api_url)
-            subsegment.put_http_meta(XRAY_HTTP_METHOD, 'GET')
+        # Prepare multipart/related body: JSON metadata part, then the raw email part
+        boundary = f'==============={uuid.uuid4().hex}=='
+        metadata = {'labelIds': label_ids} if label_ids else {}
+        prefix = (
+            f'--{boundary}\r\n'
+            'Content-Type: application/json; charset=UTF-8\r\n\r\n'
+            f'{json.dumps(metadata)}\r\n'
+            f'--{boundary}\r\n'
+            'Content-Type: message/rfc822\r\n\r\n'
+        ).encode('utf-8')
+        suffix = f'\r\n--{boundary}--\r\n'.encode('utf-8')
+        body = StreamingUploadBody(prefix, email_stream, email_size, suffix)
+
+        # Set HTTP request metadata
+        if subsegment:
+            subsegment.put_http_meta(XRAY_HTTP_URL, GMAIL_IMPORT_URL)
+            subsegment.put_http_meta(XRAY_HTTP_METHOD, 'POST')
 
             # Add annotations for tracing
-            subsegment.put_annotation('gmail_message_id', message_id)
+            subsegment.put_annotation('email_size_bytes', email_size)
+            subsegment.put_annotation('label_count', len(label_ids) if label_ids else 0)
 
         # Execute Gmail API call
-        response = service.users().messages().get(
-            userId=GMAIL_USER_ID,
-            id=message_id,
-            format='minimal'
-        ).execute()
+        response = gmail_session.post(
+            GMAIL_IMPORT_URL,
+            params=GMAIL_IMPORT_PARAMS,
+            data=body,
+            headers={
+                'Authorization': f'Bearer {creds.token}',
+                'Content-Type': f'multipart/related; boundary="{boundary}"'
+            },
+            timeout=GMAIL_API_TIMEOUT
+        )
 
         # Set HTTP response metadata
         if subsegment:
-            subsegment.put_http_meta(XRAY_HTTP_STATUS, HTTPStatus.OK)
+            subsegment.put_http_meta(XRAY_HTTP_STATUS, response.status_code)
 
-            # Add response annotations
-            label_count = len(response.get('labelIds', []))
-            subsegment.put_annotation('label_count', label_count)
+        if not response.ok:
+            if subsegment:
+                subsegment.put_annotation('error', True)
+                subsegment.put_annotation('error_message', response.text[:200])
+            raise GmailApiError(f"Gmail API error {response.status_code}: {response.text[:200]}", response.status_code)
 
-        return response
+        result = response.json()
 
-    except HttpError as e:
-        # Capture HTTP error details
+        # Add response annotations
+        if subsegment:
+            subsegment.put_annotation('gmail_message_id', result.get('id', 'unknown'))
+            subsegment.put_annotation('gmail_thread_id', result.get('threadId', 'unknown'))
+
+        return result
+
+    except requests.RequestException as e:
+        # Capture connection error details
         if subsegment:
-            status_code = e.resp.status if hasattr(e, 'resp') else HTTPStatus.INTERNAL_SERVER_ERROR
-            subsegment.put_http_meta(XRAY_HTTP_STATUS, status_code)
             subsegment.put_annotation('error', True)
             subsegment.put_annotation('error_message', str(e))
-        raise RuntimeError(f"Gmail API get error: {e}")
+        raise RuntimeError(f"Gmail API connection error: {e}")
     finally:
         # Always end the subsegment
-        xray_recorder.end_subsegment()
+        if XRAY_DETAILED_TRACING:
+            xray_recorder.end_subsegment()
 
 
 def publish_metrics(success_count: int, failure_count: int) -> None:
     """
     Publish custom CloudWatch metrics for Gmail forwarding success/failure rates.
+    Metrics are flushed as EMF logs when the handler returns, avoiding a PutMetricData call.
 
     Args:
         success_count: Number of successfully forwarded emails
         failure_count: Number of failed forwards
     """
     try:
-        metric_data = []
-
         if success_count > 0:
-            metric_data.append({
-                'MetricName': 'GmailForwardSuccess',
-                'Value': success_count,
-                'Unit': 'Count',
-                'StorageResolution': 60
-            })
+            metrics.add_metric(name='GmailForwardSuccess', unit=MetricUnit.Count, value=success_count)
 
         if failure_count > 0:
-            metric_data.append({
-                'MetricName': 'GmailForwardFailure',
-                'Value': failure_count,
-                'Unit': 'Count',
-                'StorageResolution': 60
-            })
+            metrics.add_metric(name='GmailForwardFailure', unit=MetricUnit.Count, value=failure_count)
 
-        if metric_data:
-            cloudwatch.put_metric_data(
-                Namespace=f'SESMail/{ENVIRONMENT}',
-                MetricData=metric_data
-            )
-            logger.info("Published metrics", extra={
-                "successCount": success_count,
-                "failureCount": failure_count
-            })
+        logger.debug("Published metrics", extra={
+            "successCount": success_count,
+            "failureCount": failure_count
+        })
 
     except Exception as e:
         # Don't fail the lambda if metrics publishing fails
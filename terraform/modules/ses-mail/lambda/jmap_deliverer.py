@@ -8,27 +8,35 @@ service using the Blob/allocate and Email/import JMAP methods.
 The JMAP API uses IAM authentication (SigV4 signing) for authorization.
 """
 
+import contextlib
+import functools
+import io
 import json
 import os
-from datetime import datetime, timezone
+import shutil
+import tempfile
+import time
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
 from http import HTTPStatus
-from typing import Any
-from urllib.request import Request, urlopen
-from urllib.error import HTTPError, URLError
+from typing import Any, Callable, Iterator
 
 import boto3
+import urllib3
 from botocore.auth import SigV4Auth
 from botocore.awsrequest import AWSRequest
 from botocore.exceptions import ClientError
 
 # X-Ray SDK for distributed tracing
+# Only botocore is patched: JMAP and blob upload calls get their own subsegments below,
+# so patching httplib as well would trace each of them twice
 from aws_xray_sdk.core import xray_recorder
-from aws_xray_sdk.core import patch_all
+from aws_xray_sdk.core import patch
 from aws_xray_sdk.ext.util import inject_trace_header
-patch_all()
+patch(('botocore',))
 
 # Configure structured JSON logging
-from aws_lambda_powertools import Logger
+from aws_lambda_powertools import Logger, Metrics
+from aws_lambda_powertools.metrics import MetricUnit
 logger = Logger(service="ses-mail-jmap-deliverer")
 
 # Environment configuration
@@ -36,6 +44,10 @@ JMAP_API_URL_PARAMETER = os.environ.get('JMAP_API_URL_PARAMETER')
 EMAIL_BUCKET = os.environ.get('EMAIL_BUCKET')
 ENVIRONMENT = os.environ.get('ENVIRONMENT', 'unknown')
 S3_PREFIX = 'emails'  # Hardcoded to match ses.tf configuration
+MAX_CONCURRENT_TARGETS = 4  # Targets of one email delivered to JMAP at the same time
+EMAIL_SPOOL_MAX_MEMORY = 8 * 1024 * 1024  # Bytes held in memory before spooling to /tmp
+JMAP_API_TIMEOUT = urllib3.Timeout(connect=5, read=30)
+BLOB_UPLOAD_TIMEOUT = urllib3.Timeout(connect=5, read=60)
 
 # X-Ray HTTP metadata keys
 XRAY_HTTP_URL = "url"
@@ -45,11 +57,24 @@ XRAY_HTTP_STATUS = "status"
 # Initialize AWS clients
 s3_client = boto3.client('s3')
 ssm_client = boto3.client('ssm')
-cloudwatch = boto3.client('cloudwatch')
+
+# Custom metrics are emitted as CloudWatch Embedded Metric Format (EMF) logs.
+# No service is set so the metrics stay dimensionless, matching the alarms and dashboard.
+metrics = Metrics(namespace=f'SESMail/{ENVIRONMENT}')
+
+# Shared HTTP connection pool (one per host) so TCP and TLS connections to the
+# JMAP API and the blob upload URLs are reused across requests and warm invocations
+http_pool = urllib3.PoolManager(maxsize=MAX_CONCURRENT_TARGETS, retries=False)
+
+# Thread pool for delivering an email to several JMAP targets concurrently
+_target_executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_TARGETS)
 
 # Cached JMAP API URL
 _jmap_api_url = None
 
+# Cached SigV4 signer for the JMAP API (credentials and region resolved once)
+_jmap_signer: SigV4Auth | None = None
+
 
 def get_jmap_api_url() -> str:
     """
@@ -77,6 +102,23 @@ def get_jmap_api_url() -> str:
         raise RuntimeError(f"Failed to load JMAP API URL from SSM: {e}")
 
 
+def get_jmap_signer() -> SigV4Auth:
+    """
+    Get the SigV4 signer for JMAP API requests.
+    Cached for Lambda lifetime - the session credentials refresh themselves when needed.
+
+    Returns:
+        SigV4Auth: Signer for the execute-api service
+    """
+    global _jmap_signer
+
+    if _jmap_signer is None:
+        session = boto3.Session()
+        _jmap_signer = SigV4Auth(session.get_credentials(), 'execute-api', session.region_name or 'ap-southeast-2')
+
+    return _jmap_signer
+
+
 def sign_request(method: str, url: str, body: bytes | None = None, headers: dict | None = None) -> dict:
     """
     Sign an HTTP request using AWS SigV4.
@@ -90,10 +132,6 @@ def sign_request(method: str, url: str, body: bytes | None = None, headers: dict
     Returns:
         dict: Headers with SigV4 signature
     """
-    session = boto3.Session()
-    credentials = session.get_credentials()
-    region = session.region_name or 'ap-southeast-2'
-
     # Create AWS request for signing
     aws_request = AWSRequest(
         method=method,
@@ -103,7 +141,7 @@ def sign_request(method: str, url: str, body: bytes | None = None, headers: dict
     )
 
     # Sign the request
-    SigV4Auth(credentials, 'execute-api', region).add_auth(aws_request)
+    get_jmap_signer().add_auth(aws_request)
 
     return dict(aws_request.headers)
 
@@ -154,35 +192,31 @@ def make_jmap_request(account_id: str, method_calls: list, using: list, operatio
             # Inject X-Ray trace header for downstream trace linking
             inject_trace_header(signed_headers, subsegment)
 
-        request = Request(url, data=body_bytes, headers=signed_headers, method='POST')
-        with urlopen(request, timeout=30) as response:
-            response_body = response.read().decode('utf-8')
-            result = json.loads(response_body)
+        response = http_pool.request('POST', url, body=body_bytes, headers=signed_headers, timeout=JMAP_API_TIMEOUT)
 
-            if subsegment:
-                subsegment.put_http_meta(XRAY_HTTP_STATUS, response.status)
+        if subsegment:
+            subsegment.put_http_meta(XRAY_HTTP_STATUS, response.status)
 
-            return result
+        if response.status >= HTTPStatus.BAD_REQUEST:
+            error_body = response.data[:500].decode('utf-8', 'replace')
 
-    except HTTPError as e:
-        status_code = e.code
-        error_body = e.read().decode('utf-8') if e.fp else ''
+            if subsegment:
+                subsegment.put_annotation('error', True)
 
-        if subsegment:
-            subsegment.put_http_meta(XRAY_HTTP_STATUS, status_code)
-            subsegment.put_annotation('error', True)
+            logger.error("JMAP API HTTP error", extra={
+                "status_code": response.status,
+                "error_body": error_body[:500]
+            })
 
-        logger.error("JMAP API HTTP error", extra={
-            "status_code": status_code,
-            "error_body": error_body[:500]
-        })
+            raise RuntimeError(f"JMAP API error {response.status}: {error_body[:200]}")
 
-        raise RuntimeError(f"JMAP API error {status_code}: {error_body[:200]}")
+        # json.loads detects the UTF-8 encoding of bytes itself
+        return json.loads(response.data)
 
-    except URLError as e:
+    except urllib3.exceptions.HTTPError as e:
         if subsegment:
             subsegment.put_annotation('error', True)
-            subsegment.put_annotation('error_type', 'URLError')
+            subsegment.put_annotation('error_type', type(e).__name__)
 
         logger.error("JMAP API connection error", extra={"error": str(e)})
         raise RuntimeError(f"JMAP API connection error: {e}")
@@ -223,33 +257,32 @@ def upload_blob_stream(presigned_url: str, email_stream, size: int, blob_id: str
             # Inject X-Ray trace header for downstream trace linking
             inject_trace_header(headers, subsegment)
 
-        # urllib.request supports file-like objects for streaming upload
-        request = Request(presigned_url, data=email_stream, headers=headers, method='PUT')
-        with urlopen(request, timeout=60) as response:
+        # urllib3 streams file-like bodies in chunks; Content-Length avoids chunked encoding
+        response = http_pool.request('PUT', presigned_url, body=email_stream, headers=headers, timeout=BLOB_UPLOAD_TIMEOUT)
+
+        if subsegment:
+            subsegment.put_http_meta(XRAY_HTTP_STATUS, response.status)
+
+        if response.status >= HTTPStatus.BAD_REQUEST:
             if subsegment:
-                subsegment.put_http_meta(XRAY_HTTP_STATUS, response.status)
+                subsegment.put_annotation('error', True)
 
-            logger.info("Blob uploaded successfully", extra={
-                "status": response.status,
-                "size": size
+            error_body = response.data[:500].decode('utf-8', 'replace')
+            logger.error("Blob upload HTTP error", extra={
+                "status_code": response.status,
+                "error_body": error_body[:500]
             })
+            raise RuntimeError(f"Blob upload error {response.status}: {error_body[:200]}")
 
-    except HTTPError as e:
-        if subsegment:
-            subsegment.put_http_meta(XRAY_HTTP_STATUS, e.code)
-            subsegment.put_annotation('error', True)
-
-        error_body = e.read().decode('utf-8') if e.fp else ''
-        logger.error("Blob upload HTTP error", extra={
-            "status_code": e.code,
-            "error_body": error_body[:500]
+        logger.info("Blob uploaded successfully", extra={
+            "status": response.status,
+            "size": size
         })
-        raise RuntimeError(f"Blob upload error {e.code}: {error_body[:200]}")
 
-    except URLError as e:
+    except urllib3.exceptions.HTTPError as e:
         if subsegment:
             subsegment.put_annotation('error', True)
-            subsegment.put_annotation('error_type', 'URLError')
+            subsegment.put_annotation('error_type', type(e).__name__)
 
         logger.error("Blob upload connection error", extra={"error": str(e)})
         raise RuntimeError(f"Blob upload connection error: {e}")
@@ -334,7 +367,9 @@ def deliver_to_jmap(account_id: str, email_size: int, email_stream, mailbox_ids:
     # Convert mailbox_ids list to the JMAP format {mailboxId: true, ...}
     mailbox_ids_map = {mid: True for mid in mailbox_ids}
 
-    received_at = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+    now = time.gmtime()
+    received_at = (f'{now.tm_year:04d}-{now.tm_mon:02d}-{now.tm_mday:02d}'
+                   f'T{now.tm_hour:02d}:{now.tm_min:02d}:{now.tm_sec:02d}Z')
 
     logger.info("Importing email", extra={
         "account_id": account_id,
@@ -423,6 +458,34 @@ def get_email_stream_from_s3(message_id: str) -> tuple[int, Any]:
         raise RuntimeError(f"Failed to get email from S3: {e}")
 
 
+@contextlib.contextmanager
+def shared_email_stream(message_id: str) -> Iterator[Callable[[], tuple[int, Any]]]:
+    """
+    Fetch an email from S3 once so several targets can read it at the same time.
+
+    Emails up to EMAIL_SPOOL_MAX_MEMORY are held in memory; larger ones are
+    spooled to a temporary file in /tmp, which is removed on exit.
+
+    Args:
+        message_id: SES message ID
+
+    Yields:
+        Callable: Returns (content_length, stream) with a new stream positioned at
+            the start of the email on each call
+    """
+    email_size, email_stream = get_email_stream_from_s3(message_id)
+
+    if email_size <= EMAIL_SPOOL_MAX_MEMORY:
+        email_bytes = email_stream.read()
+        yield lambda: (email_size, io.BytesIO(email_bytes))
+        return
+
+    with tempfile.NamedTemporaryFile() as spool:
+        shutil.copyfileobj(email_stream, spool)
+        spool.flush()
+        yield lambda: (email_size, open(spool.name, 'rb'))
+
+
 def extract_subject(ses_message: dict, max_length: int = 64) -> str:
     """
     Extract and safely truncate email subject from SES message headers.
@@ -443,6 +506,7 @@ def extract_subject(ses_message: dict, max_length: int = 64) -> str:
     return '(no subject)'
 
 
+@metrics.log_metrics
 def lambda_handler(event, context):
     """
     Lambda handler for processing enriched email messages from SQS.
@@ -458,37 +522,34 @@ def lambda_handler(event, context):
     _ = context  # Unused but required by Lambda handler signature
     logger.info("Received SQS event", extra={"messageCount": len(event.get('Records', []))})
 
-    results = []
+    batch_item_failures = []
     success_count = 0
-    failure_count = 0
 
     # Process each SQS record
     records = event.get('Records', [])
     for record in records:
         result = process_sqs_record(record)
-        results.append(result)
 
         if result.get('status') == 'ok':
             success_count += 1
         else:
-            failure_count += 1
+            # Partial batch responses identify failed records by SQS message ID
+            batch_item_failures.append({'itemIdentifier': record.get('messageId')})
+
+    failure_count = len(batch_item_failures)
 
     # Publish custom metrics
     publish_metrics(success_count, failure_count)
 
     logger.info("Processed messages", extra={
-        "totalCount": len(results),
+        "totalCount": len(records),
         "successCount": success_count,
         "failureCount": failure_count
     })
 
     return {
         'statusCode': HTTPStatus.OK,
-        'batchItemFailures': [
-            {'itemIdentifier': r['receiptHandle']}
-            for r in results
-            if r.get('status') == 'error'
-        ]
+        'batchItemFailures': batch_item_failures
     }
 
 
@@ -502,7 +563,6 @@ def process_sqs_record(record) -> dict:
     Returns:
         dict: Result with messageId, jmap results, and status
     """
-    receipt_handle = record.get('receiptHandle')
     subsegment = xray_recorder.begin_subsegment('process_jmap_delivery')
 
     message_id = None
@@ -533,64 +593,26 @@ def process_sqs_record(record) -> dict:
         if not message_id:
             raise ValueError("Missing originalMessageId in enriched message")
 
-        # Process each target
-        # Note: We fetch from S3 for each target because the stream can only be
-        # consumed once. This maintains memory efficiency while supporting multiple targets.
-        delivery_results = []
-        for target_info in targets:
-            recipient = target_info.get('target')  # Original recipient email
-            account_id = target_info.get('destination')  # JMAP account ID
-            mailbox_ids = target_info.get('mailboxIds', ['inbox'])
-
-            if subsegment:
-                subsegment.put_annotation('messageId', message_id)
-                subsegment.put_annotation('source', source)
-                subsegment.put_annotation('action', 'deliver-to-jmap')
-                subsegment.put_annotation('recipient', recipient)
-                subsegment.put_annotation('account_id', account_id)
-
-            logger.info("Processing email delivery to JMAP",
-                messageId=message_id,
-                sender=source,
-                recipient=recipient,
-                subject=subject[:64] if subject else '(no subject)',
-                targetAccountId=account_id,
-                mailboxIds=mailbox_ids
-            )
-
-            # Get email stream from S3 (fetched per-target since streams are single-use)
-            email_size, email_stream = get_email_stream_from_s3(message_id)
-            logger.info("Got email stream from S3", extra={
-                "messageId": message_id,
-                "size": email_size
-            })
-
-            # Deliver to JMAP - streams directly without loading into memory
-            jmap_result = deliver_to_jmap(account_id, email_size, email_stream, mailbox_ids)
-
-            logger.info("Successfully delivered to JMAP",
-                messageId=message_id,
-                jmapEmailId=jmap_result.get('email_id')
-            )
-
-            # Log action result for dashboard
-            logger.info("Action result", extra={
-                "messageId": message_id,
-                "sender": source,
-                "subject": extract_subject(ses_message, max_length=64),
-                "recipient": recipient,
-                "action": "deliver-to-jmap",
-                "result": "success",
-                "target": account_id,
-                "resultId": jmap_result.get('email_id')
-            })
-
-            delivery_results.append({
-                'recipient': recipient,
-                'account_id': account_id,
-                'email_id': jmap_result.get('email_id'),
-                'blob_id': jmap_result.get('blob_id')
-            })
+        if subsegment:
+            subsegment.put_annotation('messageId', message_id)
+            subsegment.put_annotation('source', source)
+            subsegment.put_annotation('action', 'deliver-to-jmap')
+            # With several targets, the last one is annotated
+            subsegment.put_annotation('recipient', targets[-1].get('target'))
+            subsegment.put_annotation('account_id', targets[-1].get('destination'))
+
+        # Target-independent, so extracted once for all targets
+        result_subject = extract_subject(ses_message, max_length=64)
+
+        if len(targets) == 1:
+            # A single target streams the email straight from S3 to the blob upload
+            open_email = functools.partial(get_email_stream_from_s3, message_id)
+            delivery_results = [deliver_to_target(message_id, source, subject, result_subject, open_email, targets[0])]
+        else:
+            # Fetch the email from S3 once and deliver it to the targets concurrently
+            with shared_email_stream(message_id) as open_email:
+                deliver = functools.partial(deliver_to_target, message_id, source, subject, result_subject, open_email)
+                delivery_results = deliver_to_targets_concurrently(subsegment, deliver, targets)
 
         if subsegment:
             subsegment.put_annotation('delivery_status', 'success')
@@ -602,8 +624,7 @@ def process_sqs_record(record) -> dict:
         return {
             'messageId': message_id,
             'results': delivery_results,
-            'status': 'ok',
-            'receiptHandle': receipt_handle
+            'status': 'ok'
         }
 
     except (RuntimeError, ValueError, ClientError, json.JSONDecodeError) as e:
@@ -630,50 +651,160 @@ def process_sqs_record(record) -> dict:
 
         return {
             'error': str(e),
-            'status': 'error',
-            'receiptHandle': receipt_handle
+            'status': 'error'
         }
 
     finally:
         xray_recorder.end_subsegment()
 
 
+def deliver_to_target(message_id: str, source: str, subject: str | None, result_subject: str,
+                      open_email: Callable[[], tuple[int, Any]], target_info: dict) -> dict:
+    """
+    Deliver an email to a single deliver-to-jmap target.
+
+    Args:
+        message_id: SES message ID
+        source: Sender email address
+        subject: Email subject from the common headers
+        result_subject: Truncated subject for the action result log (see extract_subject)
+        open_email: Returns (content_length, stream) for a new stream of the email
+        target_info: Target with the original recipient, JMAP account ID and mailbox IDs
+
+    Returns:
+        dict: Delivery result with recipient, account_id, email_id and blob_id
+
+    Raises:
+        RuntimeError: If the S3 fetch or JMAP delivery fails
+    """
+    recipient = target_info.get('target')  # Original recipient email
+    account_id = target_info.get('destination')  # JMAP account ID
+    mailbox_ids = target_info.get('mailboxIds', ['inbox'])
+
+    logger.info("Processing email delivery to JMAP",
+        messageId=message_id,
+        sender=source,
+        recipient=recipient,
+        subject=subject[:64] if subject else '(no subject)',
+        targetAccountId=account_id,
+        mailboxIds=mailbox_ids
+    )
+
+    email_size, email_stream = open_email()
+    logger.info("Got email stream", extra={
+        "messageId": message_id,
+        "size": email_size
+    })
+
+    # Deliver to JMAP - streams the email without copying it
+    with email_stream:
+        jmap_result = deliver_to_jmap(account_id, email_size, email_stream, mailbox_ids)
+
+    logger.info("Successfully delivered to JMAP",
+        messageId=message_id,
+        jmapEmailId=jmap_result.get('email_id')
+    )
+
+    # Log action result for dashboard
+    logger.info("Action result", extra={
+        "messageId": message_id,
+        "sender": source,
+        "subject": result_subject,
+        "recipient": recipient,
+        "action": "deliver-to-jmap",
+        "result": "success",
+        "target": account_id,
+        "resultId": jmap_result.get('email_id')
+    })
+
+    return {
+        'recipient': recipient,
+        'account_id': account_id,
+        'email_id': jmap_result.get('email_id'),
+        'blob_id': jmap_result.get('blob_id')
+    }
+
+
+def deliver_to_targets_concurrently(trace_entity, deliver: Callable[[dict], dict], targets: list) -> list:
+    """
+    Deliver to several targets on the target thread pool, stopping at the first failure.
+
+    The record is redelivered as a whole when any target fails, so every target that
+    was delivered before then receives the email again. Targets still queued when a
+    delivery fails are cancelled to limit those duplicates, and deliveries already in
+    flight are waited for so they finish before the shared email stream is closed.
+
+    Args:
+        trace_entity: Subsegment to nest the delivery subsegments under
+        deliver: Delivers the email to one target (deliver_to_target with the email bound)
+        targets: deliver-to-jmap targets
+
+    Returns:
+        list: Delivery results, in target order
+
+    Raises:
+        Exception: The first delivery failure, in target order
+    """
+    futures = [_target_executor.submit(run_in_trace_entity, trace_entity, deliver, target) for target in targets]
+    _, pending = wait(futures, return_when=FIRST_EXCEPTION)
+    if pending:
+        # A delivery failed - cancel the queued ones and let the in-flight ones finish
+        for future in pending:
+            future.cancel()
+        wait(pending)
+
+    # Raise the delivery failure itself, not the cancellation of a later-queued target
+    for future in futures:
+        if not future.cancelled() and future.exception() is not None:
+            raise future.exception()
+    return [future.result() for future in futures]
+
+
+def run_in_trace_entity(trace_entity, func, *args):
+    """
+    Run a function in a worker thread with its X-Ray subsegments nested under trace_entity.
+
+    X-Ray keeps the current trace entity per thread, so without this the worker's
+    subsegments would attach to the Lambda segment instead of the caller's subsegment.
+
+    Args:
+        trace_entity: Subsegment to attach new subsegments to (None to leave tracing as is)
+        func: Function to call
+        *args: Arguments for func
+
+    Returns:
+        The return value of func
+    """
+    if trace_entity:
+        xray_recorder.set_trace_entity(trace_entity)
+
+    try:
+        return func(*args)
+    finally:
+        if trace_entity:
+            xray_recorder.clear_trace_entities()
+
+
 def publish_metrics(success_count: int, failure_count: int) -> None:
     """
     Publish custom CloudWatch metrics for JMAP delivery success/failure rates.
+    Metrics are flushed as EMF logs when the handler returns, avoiding a PutMetricData call.
 
     Args:
         success_count: Number of successfully delivered emails
         failure_count: Number of failed deliveries
     """
     try:
-        metric_data = []
-
         if success_count > 0:
-            metric_data.append({
-                'MetricName': 'JmapDeliverSuccess',
-                'Value': success_count,
-                'Unit': 'Count',
-                'StorageResolution': 60
-            })
+            metrics.add_metric(name='JmapDeliverSuccess', unit=MetricUnit.Count, value=success_count)
 
         if failure_count > 0:
-            metric_data.append({
-                'MetricName': 'JmapDeliverFailure',
-                'Value': failure_count,
-                'Unit': 'Count',
-                'StorageResolution': 60
-            })
+            metrics.add_metric(name='JmapDeliverFailure', unit=MetricUnit.Count, value=failure_count)
 
-        if metric_data:
-            cloudwatch.put_metric_data(
-                Namespace=f'SESMail/{ENVIRONMENT}',
-                MetricData=metric_data
-            )
-            logger.info("Published metrics", extra={
-                "successCount": success_count,
-                "failureCount": failure_count
-            })
+        logger.info("Published metrics", extra={
+            "successCount": success_count,
+            "failureCount": failure_count
+        })
 
     except Exception as e:
         # Don't fail the lambda if metrics publishing fails
@@ -39,9 +39,76 @@ ENVIRONMENT = os.environ.get('ENVIRONMENT', 'unknown')
 cloudwatch = boto3.client('cloudwatch')
 
 # Enable X-Ray tracing
+# Only patch botocore (the CloudWatch client) - patch_all walks every supported library
 from aws_xray_sdk.core import xray_recorder
-from aws_xray_sdk.core import patch_all
-patch_all()
+from aws_xray_sdk.core import patch
+patch(('botocore',))
+
+
+def get_message_id(message: Dict[str, Any]) -> str | None:
+    """Return the SES message ID from an event notification."""
+    return (message.get('mail') or {}).get('messageId')
+
+
+def count_send(message: Dict[str, Any], metrics: Dict[str, int]) -> None:
+    """Count a Send event."""
+    metrics['send'] += 1
+
+
+def count_delivery(message: Dict[str, Any], metrics: Dict[str, int]) -> None:
+    """Count a Delivery event."""
+    metrics['delivery'] += 1
+
+
+def count_bounce(message: Dict[str, Any], metrics: Dict[str, int]) -> None:
+    """Count a Bounce event, classified as hard (permanent) or soft (transient)."""
+    metrics['bounce'] += 1
+
+    # Classify bounce type (hard/permanent vs soft/transient)
+    bounce = message.get('bounce', {})
+    bounce_type = bounce.get('bounceType', '').lower()
+
+    if bounce_type == 'permanent':
+        metrics['bounce_hard'] += 1
+        logger.info("Permanent bounce detected", extra={
+            "messageId": get_message_id(message),
+            "bouncedRecipients": bounce.get('bouncedRecipients', [])
+        })
+
+    elif bounce_type == 'transient':
+        metrics['bounce_soft'] += 1
+        logger.debug("Transient bounce detected", extra={
+            "messageId": get_message_id(message),
+            "bounceSubType": bounce.get('bounceSubType')
+        })
+
+
+def count_complaint(message: Dict[str, Any], metrics: Dict[str, int]) -> None:
+    """Count a Complaint event."""
+    metrics['complaint'] += 1
+    logger.warning("Complaint received", extra={
+        "messageId": get_message_id(message),
+        "complaintFeedbackType": message.get('complaint', {}).get('complaintFeedbackType')
+    })
+
+
+def count_reject(message: Dict[str, Any], metrics: Dict[str, int]) -> None:
+    """Count a Reject event."""
+    metrics['reject'] += 1
+    logger.warning("Email rejected by SES", extra={
+        "messageId": get_message_id(message),
+        "reason": message.get('reject', {}).get('reason')
+    })
+
+
+# SES event type (lowercased) to the function that counts it
+EVENT_COUNTERS = {
+    'send': count_send,
+    'delivery': count_delivery,
+    'bounce': count_bounce,
+    'complaint': count_complaint,
+    'reject': count_reject
+}
 
 
 def lambda_handler(event, context):
@@ -72,62 +139,26 @@ def lambda_handler(event, context):
     for record in event.get('Records', []):
         try:
             # Parse SNS message (SES event notification)
-            sns_message = record.get('Sns', {}).get('Message', '{}')
-            message = json.loads(sns_message)
+            message = json.loads(record.get('Sns', {}).get('Message', '{}'))
 
+            # Skip event types that are not counted before doing any other work
             event_type = message.get('eventType', '').lower()
+            count_event = EVENT_COUNTERS.get(event_type)
+            if not count_event:
+                continue
 
             logger.debug("Processing SES event", extra={
                 "eventType": event_type,
-                "messageId": message.get('mail', {}).get('messageId', 'unknown')
+                "messageId": get_message_id(message) or 'unknown'
             })
 
-            # Count event types
-            if event_type == 'send':
-                metrics['send'] += 1
-
-            elif event_type == 'delivery':
-                metrics['delivery'] += 1
-
-            elif event_type == 'bounce':
-                metrics['bounce'] += 1
-
-                # Classify bounce type (hard/permanent vs soft/transient)
-                bounce = message.get('bounce', {})
-                bounce_type = bounce.get('bounceType', '').lower()
-
-                if bounce_type == 'permanent':
-                    metrics['bounce_hard'] += 1
-                    logger.info("Permanent bounce detected", extra={
-                        "messageId": message.get('mail', {}).get('messageId'),
-                        "bouncedRecipients": bounce.get('bouncedRecipients', [])
-                    })
-
-                elif bounce_type == 'transient':
-                    metrics['bounce_soft'] += 1
-                    logger.debug("Transient bounce detected", extra={
-                        "messageId": message.get('mail', {}).get('messageId'),
-                        "bounceSubType": bounce.get('bounceSubType')
-                    })
-
-            elif event_type == 'complaint':
-                metrics['complaint'] += 1
-                logger.warning("Complaint received", extra={
-                    "messageId": message.get('mail', {}).get('messageId'),
-                    "complaintFeedbackType": message.get('complaint', {}).get('complaintFeedbackType')
-                })
-
-            elif event_type == 'reject':
-                metrics['reject'] += 1
-                logger.warning("Email rejected by SES", extra={
-                    "messageId": message.get('mail', {}).get('messageId'),
-                    "reason": message.get('reject', {}).get('reason')
-                })
+            count_event(message, metrics)
 
         except json.JSONDecodeError as e:
+            # 'message' is reserved by logging, so the excerpt is logged as snsMessage
             logger.exception("Failed to parse SNS message", extra={
                 "error": str(e),
-                "message": sns_message[:200]
+                "snsMessage": record.get('Sns', {}).get('Message', '')[:200]
             })
 
         except Exception as e:
@@ -173,14 +204,20 @@ def publish_metrics(metrics: Dict[str, int]) -> None:
         }
 
         # Build metric data (only include metrics with non-zero values)
+        # Each event counts as one sample of 1, sent as a single statistic set;
+        # standard (1-minute) resolution is the default
         metric_data = []
         for key, count in metrics.items():
             if count > 0:
                 metric_data.append({
                     'MetricName': metric_mapping[key],
-                    'Value': count,
-                    'Unit': 'Count',
-                    'StorageResolution': 60  # 1-minute resolution
+                    'StatisticValues': {
+                        'SampleCount': count,
+                        'Sum': count,
+                        'Minimum': 1,
+                        'Maximum': 1
+                    },
+                    'Unit': 'Count'
                 })
 
         # Publish metrics to CloudWatch (max 20 metrics per call)
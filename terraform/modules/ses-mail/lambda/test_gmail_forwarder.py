@@ -0,0 +1,589 @@
+#!/usr/bin/env python3
+"""
+Unit tests for gmail_forwarder.py
+
+Tests cover:
+- Gmail import request format (direct REST call)
+- Streaming multipart upload of the S3 email body
+- Token expiration detection for Gmail API errors
+- Processing an enriched SQS record end-to-end with mocked S3 and Gmail
+- Success/failure metrics emitted as EMF logs
+- Refresh token and access token caching across warm invocations
+"""
+
+import io
+import json
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from unittest.mock import MagicMock, call, patch
+
+# We need to mock things BEFORE importing gmail_forwarder
+# So set up environment and mock boto3 first
+
+@pytest.fixture(scope='module', autouse=True)
+def setup_mocks():
+    """Set up environment and mock boto3 before any imports."""
+    import os
+    os.environ['EMAIL_BUCKET'] = 'test-bucket'
+    os.environ['RETRY_QUEUE_URL'] = 'https://sqs.example.com/retry'
+    os.environ['ENVIRONMENT'] = 'test'
+
+    # Mock boto3.client before importing gmail_forwarder
+    with patch('boto3.client') as mock_client:
+        mock_s3 = MagicMock()
+        mock_ssm = MagicMock()
+        mock_sqs = MagicMock()
+        mock_dynamodb = MagicMock()
+
+        def get_client(service_name, **kwargs):
+            clients = {
+                's3': mock_s3,
+                'ssm': mock_ssm,
+                'sqs': mock_sqs,
+                'dynamodb': mock_dynamodb,
+            }
+            return clients.get(service_name, MagicMock())
+
+        mock_client.side_effect = get_client
+
+        with patch.dict(sys.modules, {'aws_xray_sdk.core': MagicMock()}):
+            # Now import the module
+            import gmail_forwarder
+
+            # Store the mock clients on the module for tests to access
+            gmail_forwarder._test_mocks = {
+                's3': mock_s3,
+                'ssm': mock_ssm,
+                'sqs': mock_sqs,
+                'dynamodb': mock_dynamodb,
+            }
+
+            yield gmail_forwarder
+
+
+@pytest.fixture
+def forwarder(setup_mocks):
+    """Get the forwarder module with mocks reset."""
+    for mock in setup_mocks._test_mocks.values():
+        mock.reset_mock(return_value=True, side_effect=True)
+    setup_mocks.invalidate_oauth_secrets_cache()
+    setup_mocks.invalidate_gmail_credentials()
+    return setup_mocks
+
+
+@pytest.fixture
+def creds():
+    """OAuth credentials with an access token."""
+    mock_creds = MagicMock()
+    mock_creds.token = 'access-token'
+    return mock_creds
+
+
+def make_response(status_code, payload=None):
+    """Build a mock requests.Response."""
+    response = MagicMock()
+    response.status_code = status_code
+    response.ok = status_code < 400
+    response.json.return_value = payload or {}
+    response.text = json.dumps(payload or {})
+    return response
+
+
+def posted_body(post_call):
+    """Read the streamed multipart body from a gmail_session.post call.
+
+    Returns:
+        tuple: (metadata dict, raw email bytes)
+    """
+    body = post_call.kwargs['data']
+    data = body.read()
+    assert len(data) == len(body)
+
+    content_type = post_call.kwargs['headers']['Content-Type']
+    assert content_type.startswith('multipart/related; boundary=')
+    boundary = content_type.split('boundary=', 1)[1].strip('"').encode('utf-8')
+
+    parts = data.split(b'--' + boundary)
+    assert parts[0] == b'' and parts[-1] == b'--\r\n'
+    metadata_headers, metadata = parts[1].split(b'\r\n\r\n', 1)
+    email_headers, raw = parts[2].split(b'\r\n\r\n', 1)
+    assert b'application/json' in metadata_headers
+    assert b'message/rfc822' in email_headers
+    return json.loads(metadata), raw[:-2]
+
+
+def make_sqs_record(message_id='msg-123', targets=None, sqs_message_id='sqs-1'):
+    """Build an SQS record wrapping an enriched EventBridge event."""
+    detail = {
+        'originalMessageId': message_id,
+        'actions': {
+            'forward-to-gmail': {
+                'targets': targets if targets is not None else [
+                    {'target': 'user@example.com', 'destination': 'me@gmail.com'}
+                ]
+            }
+        },
+        'ses': {
+            'mail': {
+                'source': 'sender@example.com',
+                'commonHeaders': {'subject': 'Hello'},
+                'headers': [{'name': 'Subject', 'value': 'Hello'}]
+            }
+        }
+    }
+    return {
+        'messageId': sqs_message_id,
+        'receiptHandle': 'handle-1',
+        'body': json.dumps({'detail': detail})
+    }
+
+
+class TestGmailImport:
+    """Test gmail_import() function."""
+
+    def test_posts_to_import_endpoint_with_labels(self, forwarder, creds):
+        """Import is a direct POST with bearer token and label IDs."""
+        with patch.object(forwarder, 'gmail_session') as session:
+            session.post.return_value = make_response(200, {'id': 'g1', 'threadId': 't1'})
+
+            result = forwarder.gmail_import(creds, 9, io.BytesIO(b'raw email'), ['INBOX', 'UNREAD'])
+
+        assert result['id'] == 'g1'
+        args, kwargs = session.post.call_args
+        assert args[0] == 'https://gmail.googleapis.com/upload/gmail/v1/users/me/messages/import'
+        assert kwargs['headers']['Authorization'] == 'Bearer access-token'
+        assert kwargs['params'] == {'uploadType': 'multipart', 'internalDateSource': 'receivedTime'}
+        metadata, raw = posted_body(session.post.call_args)
+        assert metadata == {'labelIds': ['INBOX', 'UNREAD']}
+        assert raw == b'raw email'
+
+    @pytest.mark.parametrize('size', [0, 1, 8192, 100000])
+    def test_streams_raw_email_without_encoding(self, forwarder, creds, size):
+        """The email is sent unmodified as the message/rfc822 part."""
+        raw = bytes(range(256)) * (size // 256) + bytes(range(size % 256))
+
+        with patch.object(forwarder, 'gmail_session') as session:
+            session.post.return_value = make_response(200, {'id': 'g1', 'threadId': 't1'})
+
+            forwarder.gmail_import(creds, size, io.BytesIO(raw), [])
+
+        metadata, posted_raw = posted_body(session.post.call_args)
+        assert metadata == {}
+        assert posted_raw == raw
+
+    def test_unauthorized_is_token_expired(self, forwarder, creds):
+        """A 401 from Gmail raises GmailApiError that is detected as token expiry."""
+        with patch.object(forwarder, 'gmail_session') as session:
+            session.post.return_value = make_response(401, {'error': 'nope'})
+
+            with pytest.raises(forwarder.GmailApiError) as exc_info:
+                forwarder.gmail_import(creds, 9, io.BytesIO(b'raw email'), ['INBOX'])
+
+        assert exc_info.value.status_code == 401
+        assert forwarder.is_token_expired_error(exc_info.value) is True
+
+    def test_server_error_is_not_token_expired(self, forwarder, creds):
+        """A 500 from Gmail is not treated as token expiry."""
+        with patch.object(forwarder, 'gmail_session') as session:
+            session.post.return_value = make_response(500, {'error': 'backend'})
+
+            with pytest.raises(forwarder.GmailApiError) as exc_info:
+                forwarder.gmail_import(creds, 9, io.BytesIO(b'raw email'), ['INBOX'])
+
+        assert forwarder.is_token_expired_error(exc_info.value) is False
+
+    @pytest.mark.parametrize('status_code,reason', [
+        (403, 'userRateLimitExceeded'),
+        (403, 'rateLimitExceeded'),
+        (403, 'insufficientPermissions'),
+        (429, 'rateLimitExceeded'),
+    ])
+    def test_rate_limit_and_forbidden_are_not_token_expired(self, forwarder, creds, status_code, reason):
+        """403 and 429 responses are ordinary failures, even if the body mentions auth."""
+        payload = {'error': {'code': status_code, 'message': 'Unauthorized client or scope', 'errors': [{'reason': reason}]}}
+        with patch.object(forwarder, 'gmail_session') as session:
+            session.post.return_value = make_response(status_code, payload)
+
+            with pytest.raises(forwarder.GmailApiError) as exc_info:
+                forwarder.gmail_import(creds, 9, io.BytesIO(b'raw email'), ['INBOX'])
+
+        assert forwarder.is_token_expired_error(exc_info.value) is False
+
+    def test_token_expired_keyword_is_case_insensitive(self, forwarder):
+        """Token expiry keywords are matched regardless of case."""
+        assert forwarder.is_token_expired_error(RuntimeError('Token has been EXPIRED or revoked')) is True
+        assert forwarder.is_token_expired_error(RuntimeError('Connection reset')) is False
+
+
+class TestStreamingUploadBody:
+    """Test StreamingUploadBody file-like reads."""
+
+    def test_chunked_reads_match_full_body(self, forwarder):
+        """Reading in fixed-size blocks (as http.client does) yields prefix, email, suffix."""
+        body = forwarder.StreamingUploadBody(b'head-', io.BytesIO(b'0123456789'), 10, b'-tail')
+        assert len(body) == 20
+
+        chunks = []
+        while True:
+            chunk = body.read(3)
+            if not chunk:
+                break
+            assert len(chunk) <= 3
+            chunks.append(chunk)
+
+        assert b''.join(chunks) == b'head-0123456789-tail'
+
+
+class TestProcessSqsRecord:
+    """Test process_sqs_record() function."""
+
+    def test_imports_email_for_target(self, forwarder, creds):
+        """A valid record is fetched from S3 and imported into Gmail."""
+        forwarder.s3_client.get_object.return_value = {'Body': io.BytesIO(b'raw email'), 'ContentLength': 9}
+
+        uploaded = []
+
+        def post(*args, **kwargs):
+            # Consume the body during the call, as requests does
+            uploaded.append(posted_body(call(*args, **kwargs))[1])
+            return make_response(200, {'id': 'g1', 'threadId': 't1'})
+
+        with patch.object(forwarder, 'gmail_session') as session:
+            session.post.side_effect = post
+
+            result = forwarder.process_sqs_record(make_sqs_record(), creds)
+
+        assert result['status'] == 'ok'
+        assert result['results'][0]['gmail_id'] == 'g1'
+        forwarder.s3_client.get_object.assert_called_once_with(Bucket='test-bucket', Key='emails/msg-123')
+        assert uploaded == [b'raw email']
+
+    def test_failed_import_closes_s3_stream(self, forwarder, creds):
+        """The S3 stream is closed when the Gmail import fails."""
+        body = io.BytesIO(b'raw email')
+        forwarder.s3_client.get_object.return_value = {'Body': body, 'ContentLength': 9}
+
+        with patch.object(forwarder, 'gmail_session') as session:
+            session.post.return_value = make_response(500, {'error': 'backend'})
+
+            result = forwarder.process_sqs_record(make_sqs_record(), creds)
+
+        assert result['status'] == 'error'
+        assert body.closed
+
+    def test_fetches_once_for_multiple_targets(self, forwarder, creds):
+        """With several targets the email is fetched once and re-read for each import."""
+        forwarder.s3_client.get_object.return_value = {'Body': io.BytesIO(b'raw email'), 'ContentLength': 9}
+        targets = [
+            {'target': 'a@example.com', 'destination': 'a@gmail.com'},
+            {'target': 'b@example.com', 'destination': 'b@gmail.com'},
+        ]
+
+        uploaded = []
+
+        def post(*args, **kwargs):
+            # Consume the body during the call, as requests does
+            uploaded.append(posted_body(call(*args, **kwargs))[1])
+            return make_response(200, {'id': 'g1', 'threadId': 't1'})
+
+        with patch.object(forwarder, 'gmail_session') as session:
+            session.post.side_effect = post
+
+            result = forwarder.process_sqs_record(make_sqs_record(targets=targets), creds)
+
+        assert result['status'] == 'ok'
+        assert len(result['results']) == 2
+        forwarder.s3_client.get_object.assert_called_once()
+        assert uploaded == [b'raw email', b'raw email']
+
+    def test_s3_error_is_error(self, forwarder, creds):
+        """A failed prefetch from S3 is reported as an error for the record."""
+        from botocore.exceptions import ClientError
+        forwarder.s3_client.get_object.side_effect = ClientError(
+            {'Error': {'Code': 'NoSuchKey', 'Message': 'missing'}}, 'GetObject'
+        )
+
+        result = forwarder.process_sqs_record(make_sqs_record(), creds)
+
+        assert result['status'] == 'error'
+        assert 'Failed to fetch email from S3' in result['error']
+
+    def test_token_expiry_queues_for_retry(self, forwarder, creds):
+        """A 401 from Gmail queues the original body to the retry queue and reports ok."""
+        forwarder.s3_client.get_object.return_value = {'Body': io.BytesIO(b'raw email'), 'ContentLength': 9}
+        record = make_sqs_record()
+
+        with patch.object(forwarder, 'gmail_session') as session:
+            session.post.return_value = make_response(401, {'error': 'expired'})
+
+            result = forwarder.process_sqs_record(record, creds)
+
+        assert result['status'] == 'ok'
+        assert result['action'] == 'queued_for_retry'
+        send_kwargs = forwarder.sqs_client.send_message.call_args.kwargs
+        assert send_kwargs['QueueUrl'] == 'https://sqs.example.com/retry'
+        assert send_kwargs['MessageBody'] == record['body']
+
+    def test_missing_targets_is_error(self, forwarder, creds):
+        """A record without forward-to-gmail targets is reported as an error."""
+        result = forwarder.process_sqs_record(make_sqs_record(targets=[]), creds)
+
+        assert result['status'] == 'error'
+        assert 'No forward-to-gmail targets' in result['error']
+
+
+class TestLoadOauthSecretsFromSsm:
+    """Test load_oauth_secrets_from_ssm() batching and caching."""
+
+    REFRESH_PARAM = '/test/refresh-token'
+    CLIENT_PARAM = '/test/client-credentials'
+
+    @pytest.fixture
+    def ssm(self, forwarder):
+        forwarder.GMAIL_REFRESH_TOKEN_PARAMETER = self.REFRESH_PARAM
+        forwarder.GMAIL_CLIENT_CREDENTIALS_PARAMETER = self.CLIENT_PARAM
+        values = {
+            self.REFRESH_PARAM: json.dumps({'token': 'refresh-1', 'expires_at_epoch': 4102444800}),
+            self.CLIENT_PARAM: json.dumps({'installed': {
+                'client_id': 'id', 'client_secret': 'secret', 'token_uri': 'https://oauth2.example.com/token'
+            }}),
+        }
+
+        def get_parameters(Names, WithDecryption):
+            return {
+                'Parameters': [{'Name': name, 'Value': values[name]} for name in Names],
+                'InvalidParameters': []
+            }
+
+        ssm = forwarder.ssm_client
+        ssm.get_parameters.side_effect = get_parameters
+        yield ssm
+        forwarder.GMAIL_REFRESH_TOKEN_PARAMETER = None
+        forwarder.GMAIL_CLIENT_CREDENTIALS_PARAMETER = None
+
+    def test_loads_both_parameters_in_one_call(self, forwarder, ssm):
+        """The refresh token and client credentials come from a single GetParameters call."""
+        refresh_token, client_creds = forwarder.load_oauth_secrets_from_ssm()
+
+        assert refresh_token == 'refresh-1'
+        assert client_creds['client_id'] == 'id'
+        ssm.get_parameters.assert_called_once()
+        assert set(ssm.get_parameters.call_args.kwargs['Names']) == {self.REFRESH_PARAM, self.CLIENT_PARAM}
+        ssm.get_parameter.assert_not_called()
+
+    def test_reuses_cached_refresh_token(self, forwarder, ssm):
+        """A second load within the TTL does not fetch the refresh token again."""
+        forwarder.load_oauth_secrets_from_ssm()
+        refresh_token, _ = forwarder.load_oauth_secrets_from_ssm()
+
+        assert refresh_token == 'refresh-1'
+        ssm.get_parameters.assert_called_once()
+
+    def test_reloads_after_ttl(self, forwarder, ssm):
+        """The refresh token is reloaded from SSM once the cache TTL has passed."""
+        with patch.object(forwarder.time, 'time', return_value=1000.0):
+            forwarder.load_oauth_secrets_from_ssm()
+        with patch.object(forwarder.time, 'time', return_value=1000.0 + forwarder.REFRESH_TOKEN_CACHE_TTL):
+            forwarder.load_oauth_secrets_from_ssm()
+
+        assert self.REFRESH_PARAM in ssm.get_parameters.call_args.kwargs['Names']
+
+    def test_caches_client_credentials(self, forwarder, ssm):
+        """Client credentials are not fetched again once loaded."""
+        forwarder.load_oauth_secrets_from_ssm()
+        with patch.object(forwarder.time, 'time', return_value=time.time() + forwarder.REFRESH_TOKEN_CACHE_TTL):
+            forwarder.load_oauth_secrets_from_ssm()
+
+        assert ssm.get_parameters.call_args.kwargs['Names'] == [self.REFRESH_PARAM]
+
+    def test_missing_parameter_is_error(self, forwarder, ssm):
+        """Parameters reported as invalid by SSM raise a RuntimeError."""
+        ssm.get_parameters.side_effect = None
+        ssm.get_parameters.return_value = {'Parameters': [], 'InvalidParameters': [self.REFRESH_PARAM]}
+
+        with pytest.raises(RuntimeError, match='not found'):
+            forwarder.load_oauth_secrets_from_ssm()
+
+    def test_token_generation_failure_invalidates_cache(self, forwarder, ssm):
+        """A failed token refresh drops the cached refresh token."""
+        with patch.object(forwarder, 'parse_client_credentials', side_effect=RuntimeError('boom')):
+            with pytest.raises(RuntimeError):
+                forwarder.generate_access_token()
+
+        forwarder.load_oauth_secrets_from_ssm()
+        assert set(ssm.get_parameters.call_args.kwargs['Names']) == {self.REFRESH_PARAM, self.CLIENT_PARAM}
+
+    def test_rejected_cached_secrets_are_reloaded_once(self, forwarder, ssm):
+        """A refresh rejected with cached secrets reloads them from SSM and retries once."""
+        from google.auth.exceptions import RefreshError
+        forwarder.load_oauth_secrets_from_ssm()
+
+        with patch('google.oauth2.credentials.Credentials.refresh', side_effect=[RefreshError('invalid_grant'), None]) as refresh:
+            forwarder.generate_access_token()
+
+        assert refresh.call_count == 2
+        assert ssm.get_parameters.call_count == 2
+
+
+class TestGenerateAccessToken:
+    """Test generate_access_token() function."""
+
+    def test_refreshes_over_shared_session(self, forwarder):
+        """The OAuth refresh reuses the module's keep-alive HTTP session."""
+        client_creds = {'client_id': 'id', 'client_secret': 'secret', 'token_uri': 'https://oauth2.example.com/token'}
+        with patch.object(forwarder, 'load_oauth_secrets_from_ssm', return_value=('refresh-1', client_creds)), \
+             patch('google.oauth2.credentials.Credentials.refresh') as refresh:
+            creds = forwarder.generate_access_token()
+
+        assert creds.refresh_token == 'refresh-1'
+        request = refresh.call_args.args[0]
+        assert request.session is forwarder.gmail_session
+
+
+class TestGetGmailCredentials:
+    """Test get_gmail_credentials() caching."""
+
+    @staticmethod
+    def make_creds(expires_in):
+        creds = MagicMock()
+        creds.expiry = datetime.now(timezone.utc).replace(tzinfo=None) + expires_in
+        return creds
+
+    def test_reuses_credentials_until_near_expiry(self, forwarder):
+        """Credentials are reused while the access token has time left."""
+        creds = self.make_creds(timedelta(minutes=30))
+        with patch.object(forwarder, 'generate_access_token', return_value=creds) as generate:
+            assert forwarder.get_gmail_credentials() == (creds, False)
+            assert forwarder.get_gmail_credentials() == (creds, True)
+
+        generate.assert_called_once()
+
+    def test_refreshes_credentials_near_expiry(self, forwarder):
+        """Credentials within the expiry margin are replaced."""
+        old = self.make_creds(timedelta(minutes=2))
+        new = self.make_creds(timedelta(minutes=60))
+        with patch.object(forwarder, 'generate_access_token', side_effect=[old, new]):
+            forwarder.get_gmail_credentials()
+            assert forwarder.get_gmail_credentials() == (new, False)
+
+    def test_rejected_token_invalidates_credentials(self, forwarder, creds):
+        """A 401 from Gmail drops the cached credentials."""
+        forwarder._gmail_creds = creds
+        forwarder.s3_client.get_object.return_value = {'Body': io.BytesIO(b'raw email'), 'ContentLength': 9}
+
+        with patch.object(forwarder, 'gmail_session') as session:
+            session.post.return_value = make_response(401, {'error': 'expired'})
+            forwarder.process_sqs_record(make_sqs_record(), creds)
+
+        assert forwarder._gmail_creds is None
+
+    def test_rejected_cached_token_is_redelivered_not_queued(self, forwarder, creds):
+        """A 401 on a token cached from an earlier invocation fails the record for SQS redelivery."""
+        forwarder._gmail_creds = creds
+        forwarder.s3_client.get_object.return_value = {'Body': io.BytesIO(b'raw email'), 'ContentLength': 9}
+
+        with patch.object(forwarder, 'gmail_session') as session:
+            session.post.return_value = make_response(401, {'error': 'expired'})
+            result = forwarder.process_sqs_record(make_sqs_record(), creds, creds_reused=True)
+
+        assert result['status'] == 'error'
+        assert forwarder._gmail_creds is None
+        forwarder.sqs_client.send_message.assert_not_called()
+
+    def test_rejected_new_token_is_queued(self, forwarder, creds):
+        """A 401 on a token generated in this invocation queues the record for retry."""
+        forwarder.s3_client.get_object.return_value = {'Body': io.BytesIO(b'raw email'), 'ContentLength': 9}
+
+        with patch.object(forwarder, 'gmail_session') as session:
+            session.post.return_value = make_response(401, {'error': 'expired'})
+            result = forwarder.process_sqs_record(make_sqs_record(), creds, creds_reused=False)
+
+        assert result['action'] == 'queued_for_retry'
+        forwarder.sqs_client.send_message.assert_called_once()
+
+
+class TestLambdaHandler:
+    """Test lambda_handler() function."""
+
+    def test_emits_dimensionless_emf_metrics(self, forwarder, creds, capsys):
+        """Success and failure counts are written as EMF logs without a service dimension."""
+        results = [
+            {'status': 'ok'},
+            {'status': 'error', 'error': 'boom'},
+        ]
+        records = [make_sqs_record(sqs_message_id='sqs-1'), make_sqs_record(sqs_message_id='sqs-2')]
+        with patch.object(forwarder, 'get_gmail_credentials', return_value=(creds, False)), \
+             patch.object(forwarder, 'process_sqs_record', side_effect=results):
+            response = forwarder.lambda_handler({'Records': records}, None)
+
+        assert response['batchItemFailures'] == [{'itemIdentifier': 'sqs-2'}]
+
+        emf = None
+        for line in capsys.readouterr().out.splitlines():
+            if '"_aws"' in line:
+                emf = json.loads(line)
+        assert emf is not None
+        directive = emf['_aws']['CloudWatchMetrics'][0]
+        assert directive['Namespace'] == 'SESMail/test'
+        assert directive['Dimensions'] == [[]]
+        assert emf['GmailForwardSuccess'] == [1.0]
+        assert emf['GmailForwardFailure'] == [1.0]
+
+    def test_prefetches_first_email_before_credentials(self, forwarder, creds):
+        """The first record's S3 fetch starts before credentials and is reused for the import."""
+        forwarder.s3_client.get_object.return_value = {'Body': io.BytesIO(b'raw email'), 'ContentLength': 9}
+
+        def get_credentials():
+            # The prefetch has been started by the time credentials are requested
+            prefetch.assert_called_once()
+            return creds, False
+
+        with patch.object(forwarder, 'prefetch_email_stream', wraps=forwarder.prefetch_email_stream) as prefetch, \
+             patch.object(forwarder, 'get_gmail_credentials', side_effect=get_credentials), \
+             patch.object(forwarder, 'gmail_session') as session:
+            session.post.return_value = make_response(200, {'id': 'g1', 'threadId': 't1'})
+            response = forwarder.lambda_handler({'Records': [make_sqs_record()]}, None)
+
+        assert response['batchItemFailures'] == []
+        forwarder.s3_client.get_object.assert_called_once()
+
+    def test_malformed_record_fails_only_that_record(self, forwarder, creds):
+        """A record whose body cannot be parsed is reported as failed without failing the invocation."""
+        malformed = {**make_sqs_record(sqs_message_id='sqs-bad'), 'body': None}
+        with patch.object(forwarder, 'get_gmail_credentials', return_value=(creds, False)), \
+             patch.object(forwarder, 'gmail_session') as session:
+            session.post.return_value = make_response(200, {'id': 'g1', 'threadId': 't1'})
+            forwarder.s3_client.get_object.return_value = {'Body': io.BytesIO(b'raw email'), 'ContentLength': 9}
+            response = forwarder.lambda_handler({'Records': [malformed, make_sqs_record(sqs_message_id='sqs-ok')]}, None)
+
+        assert response['batchItemFailures'] == [{'itemIdentifier': 'sqs-bad'}]
+
+    def test_entire_batch_failure_is_reported_not_raised(self, forwarder, creds):
+        """When every record fails, failures are returned rather than raised."""
+        with patch.object(forwarder, 'get_gmail_credentials', return_value=(creds, False)), \
+             patch.object(forwarder, 'process_sqs_record', return_value={'status': 'error', 'error': 'boom'}):
+            response = forwarder.lambda_handler({'Records': [make_sqs_record()]}, None)
+
+        assert response['batchItemFailures'] == [{'itemIdentifier': 'sqs-1'}]
+
+    def test_token_generation_expiry_queues_all_records(self, forwarder):
+        """If the refresh token has expired, every record is queued for retry."""
+        error = RuntimeError('Failed to generate access token: invalid_grant')
+        with patch.object(forwarder, 'generate_access_token', side_effect=error):
+            response = forwarder.lambda_handler({'Records': [make_sqs_record()]}, None)
+
+        assert response['batchItemFailures'] == []
+        forwarder.sqs_client.send_message.assert_called_once()
+
+    def test_token_generation_expiry_closes_prefetched_stream(self, forwarder):
+        """The prefetched S3 stream is closed when records are queued without being processed."""
+        body = io.BytesIO(b'raw email')
+        forwarder.s3_client.get_object.return_value = {'Body': body, 'ContentLength': 9}
+        error = RuntimeError('Failed to generate access token: invalid_grant')
+        with patch.object(forwarder, 'generate_access_token', side_effect=error):
+            forwarder.lambda_handler({'Records': [make_sqs_record()]}, None)
+
+        assert body.closed
@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+Unit tests for jmap_deliverer.py
+
+Tests cover:
+- SigV4 signing of JMAP API requests
+- JMAP API requests and blob uploads over the shared connection pool
+- Blob/allocate, upload and Email/import for a delivery
+- Processing an enriched SQS record with one or more JMAP targets
+- Partial batch failure reporting and EMF metrics
+"""
+
+import io
+import json
+import re
+import sys
+import threading
+
+import pytest
+from botocore.credentials import Credentials
+from unittest.mock import MagicMock, patch
+
+# We need to mock things BEFORE importing jmap_deliverer
+# So set up environment and mock boto3 first
+
+@pytest.fixture(scope='module', autouse=True)
+def setup_mocks():
+    """Set up environment and mock boto3 before any imports."""
+    import os
+    os.environ['EMAIL_BUCKET'] = 'test-bucket'
+    os.environ['JMAP_API_URL_PARAMETER'] = '/jmap/api-url'
+    os.environ['ENVIRONMENT'] = 'test'
+
+    # Mock boto3.client before importing jmap_deliverer
+    with patch('boto3.client') as mock_client:
+        mock_s3 = MagicMock()
+        mock_ssm = MagicMock()
+
+        def get_client(service_name, **kwargs):
+            clients = {
+                's3': mock_s3,
+                'ssm': mock_ssm,
+            }
+            return clients.get(service_name, MagicMock())
+
+        mock_client.side_effect = get_client
+
+        with patch.dict(sys.modules, {'aws_xray_sdk.core': MagicMock(), 'aws_xray_sdk.ext.util': MagicMock()}):
+            # Now import the module
+            import jmap_deliverer
+
+            # Store the mock clients on the module for tests to access
+            jmap_deliverer._test_mocks = {
+                's3': mock_s3,
+                'ssm': mock_ssm,
+            }
+
+            yield jmap_deliverer
+
+
+@pytest.fixture
+def deliverer(setup_mocks):
+    """Get the deliverer module with mocks and caches reset."""
+    for mock in setup_mocks._test_mocks.values():
+        mock.reset_mock(return_value=True, side_effect=True)
+    setup_mocks._jmap_api_url = 'https://api.example.com'
+    setup_mocks._jmap_signer = None
+    return setup_mocks
+
+
+@pytest.fixture
+def aws_session():
+    """boto3 session with static credentials."""
+    session = MagicMock()
+    session.get_credentials.return_value = Credentials('AKIDEXAMPLE', 'secret')
+    session.region_name = 'us-east-1'
+    with patch('boto3.Session', return_value=session) as session_class:
+        yield session_class
+
+
+def make_response(status, payload=None):
+    """Build a mock urllib3 response."""
+    response = MagicMock()
+    response.status = status
+    response.data = json.dumps(payload or {}).encode('utf-8')
+    return response
+
+
+def make_sqs_record(message_id='msg-123', targets=None, sqs_message_id='sqs-1'):
+    """Build an SQS record wrapping an enriched EventBridge event."""
+    detail = {
+        'originalMessageId': message_id,
+        'actions': {
+            'deliver-to-jmap': {
+                'targets': targets if targets is not None else [
+                    {'target': 'user@example.com', 'destination': 'acc-1', 'mailboxIds': ['inbox']}
+                ]
+            }
+        },
+        'ses': {
+            'mail': {
+                'source': 'sender@example.com',
+                'commonHeaders': {'subject': 'Hello'},
+                'headers': [{'name': 'Subject', 'value': 'Hello'}]
+            }
+        }
+    }
+    return {
+        'messageId': sqs_message_id,
+        'receiptHandle': 'handle-1',
+        'body': json.dumps({'detail': detail})
+    }
+
+
+class TestSignRequest:
+    """Tests for SigV4 signing of JMAP API requests."""
+
+    def test_signs_for_execute_api(self, deliverer, aws_session):
+        """Requests are signed for execute-api in the session region."""
+        headers = deliverer.sign_request('POST', 'https://api.example.com/jmap-iam/acc', b'{}',
+                                         {'Content-Type': 'application/json'})
+
+        assert headers['Authorization'].startswith('AWS4-HMAC-SHA256 Credential=AKIDEXAMPLE/')
+        assert '/us-east-1/execute-api/aws4_request' in headers['Authorization']
+        assert headers['Content-Type'] == 'application/json'
+
+    def test_reuses_session_across_requests(self, deliverer, aws_session):
+        """Credentials are resolved once, not for every signed request."""
+        deliverer.sign_request('POST', 'https://api.example.com/jmap-iam/acc', b'{}')
+        deliverer.sign_request('POST', 'https://api.example.com/jmap-iam/acc', b'{}')
+
+        aws_session.assert_called_once()
+
+
+class TestMakeJmapRequest:
+    """Tests for signed JMAP API requests."""
+
+    def test_posts_signed_request(self, deliverer, aws_session):
+        """The signed JSON body is POSTed to the account's IAM endpoint."""
+        method_calls = [['Core/echo', {}, 'c0']]
+        with patch.object(deliverer, 'http_pool') as http_pool:
+            http_pool.request.return_value = make_response(200, {'methodResponses': []})
+
+            result = deliverer.make_jmap_request('acc-1', method_calls, ['urn:ietf:params:jmap:core'])
+
+        assert result == {'methodResponses': []}
+        method, url = http_pool.request.call_args.args
+        kwargs = http_pool.request.call_args.kwargs
+        assert (method, url) == ('POST', 'https://api.example.com/jmap-iam/acc-1')
+        assert json.loads(kwargs['body'])['methodCalls'] == method_calls
+        assert kwargs['headers']['Authorization'].startswith('AWS4-HMAC-SHA256')
+
+    def test_http_error_raises(self, deliverer, aws_session):
+        """An error status from the JMAP API is raised as a RuntimeError."""
+        with patch.object(deliverer, 'http_pool') as http_pool:
+            http_pool.request.return_value = make_response(403, {'message': 'Forbidden'})
+
+            with pytest.raises(RuntimeError, match='JMAP API error 403'):
+                deliverer.make_jmap_request('acc-1', [], [])
+
+    def test_connection_error_raises(self, deliverer, aws_session):
+        """A connection failure is raised as a RuntimeError."""
+        import urllib3
+        with patch.object(deliverer, 'http_pool') as http_pool:
+            http_pool.request.side_effect = urllib3.exceptions.NewConnectionError(None, 'refused')
+
+            with pytest.raises(RuntimeError, match='JMAP API connection error'):
+                deliverer.make_jmap_request('acc-1', [], [])
+
+
+class TestUploadBlobStream:
+    """Tests for streaming blob uploads."""
+
+    def test_streams_body_with_content_length(self, deliverer):
+        """The email stream is PUT as-is with an explicit Content-Length."""
+        stream = io.BytesIO(b'raw email')
+        with patch.object(deliverer, 'http_pool') as http_pool:
+            http_pool.request.return_value = make_response(200)
+
+            deliverer.upload_blob_stream('https://bucket.example.com/blob?sig=1', stream, 9)
+
+        kwargs = http_pool.request.call_args.kwargs
+        assert http_pool.request.call_args.args == ('PUT', 'https://bucket.example.com/blob?sig=1')
+        assert kwargs['body'] is stream
+        assert kwargs['headers']['Content-Length'] == '9'
+
+    def test_http_error_raises(self, deliverer):
+        """An error status from the upload URL is raised as a RuntimeError."""
+        with patch.object(deliverer, 'http_pool') as http_pool:
+            http_pool.request.return_value = make_response(403)
+
+            with pytest.raises(RuntimeError, match='Blob upload error 403'):
+                deliverer.upload_blob_stream('https://bucket.example.com/blob', io.BytesIO(b''), 0)
+
+
+class TestDeliverToJmap:
+    """Tests for the allocate, upload and import sequence."""
+
+    def test_allocates_uploads_and_imports(self, deliverer):
+        """The blob is allocated, uploaded and imported into the given mailboxes."""
+        allocate = {'methodResponses': [['Blob/allocate', {
+            'created': {'blob0': {'id': 'blob-1', 'url': 'https://bucket.example.com/blob-1'}}
+        }, 'c0']]}
+        imported = {'methodResponses': [['Email/import', {
+            'created': {'e0': {'id': 'email-1'}}
+        }, 'c0']]}
+        stream = io.BytesIO(b'raw email')
+
+        with patch.object(deliverer, 'make_jmap_request', side_effect=[allocate, imported]) as jmap, \
+                patch.object(deliverer, 'upload_blob_stream') as upload:
+            result = deliverer.deliver_to_jmap('acc-1', 9, stream, ['inbox'])
+
+        assert result == {'email_id': 'email-1', 'blob_id': 'blob-1'}
+        upload.assert_called_once_with('https://bucket.example.com/blob-1', stream, 9, blob_id='blob-1')
+        email = jmap.call_args.kwargs['method_calls'][0][1]['emails']['e0']
+        assert email['blobId'] == 'blob-1'
+        assert email['mailboxIds'] == {'inbox': True}
+        assert re.fullmatch(r'\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}Z', email['receivedAt'])
+
+
+class TestProcessSqsRecord:
+    """Tests for processing enriched SQS records."""
+
+    @pytest.fixture
+    def s3(self, deliverer):
+        """S3 client returning a fresh email stream for each GetObject."""
+        s3 = deliverer._test_mocks['s3']
+        s3.get_object.side_effect = lambda **kwargs: {
+            'ContentLength': 9,
+            'Body': io.BytesIO(b'raw email')
+        }
+        return s3
+
+    def test_delivers_single_target(self, deliverer, s3):
+        """A single target is delivered and its result returned."""
+        delivered = []
+
+        def deliver(account_id, size, stream, mailbox_ids):
+            delivered.append((account_id, size, stream.read(), mailbox_ids))
+            return {'email_id': 'e1', 'blob_id': 'b1'}
+
+        with patch.object(deliverer, 'deliver_to_jmap', side_effect=deliver):
+            result = deliverer.process_sqs_record(make_sqs_record())
+
+        assert result['status'] == 'ok'
+        assert result['results'] == [
+            {'recipient': 'user@example.com', 'account_id': 'acc-1', 'email_id': 'e1', 'blob_id': 'b1'}
+        ]
+        assert delivered == [('acc-1', 9, b'raw email', ['inbox'])]
+
+    def test_delivers_targets_concurrently(self, deliverer, s3):
+        """Several targets are delivered at the same time, with results in target order."""
+        targets = [
+            {'target': 'a@example.com', 'destination': 'acc-a'},
+            {'target': 'b@example.com', 'destination': 'acc-b'},
+        ]
+        barrier = threading.Barrier(len(targets), timeout=5)
+
+        def deliver(account_id, size, stream, mailbox_ids):
+            barrier.wait()
+            return {'email_id': f'email-{account_id}', 'blob_id': f'blob-{account_id}'}
+
+        with patch.object(deliverer, 'deliver_to_jmap', side_effect=deliver):
+            result = deliverer.process_sqs_record(make_sqs_record(targets=targets))
+
+        assert result['status'] == 'ok'
+        assert [r['email_id'] for r in result['results']] == ['email-acc-a', 'email-acc-b']
+
+    @pytest.mark.parametrize('spool_max_memory', [1024, 4], ids=['in-memory', 'spooled-to-disk'])
+    def test_fetches_email_once_for_all_targets(self, deliverer, s3, spool_max_memory):
+        """Several targets share one S3 fetch, each reading the whole email."""
+        targets = [
+            {'target': 'a@example.com', 'destination': 'acc-a'},
+            {'target': 'b@example.com', 'destination': 'acc-b'},
+        ]
+        uploaded = {}
+
+        def deliver(account_id, size, stream, mailbox_ids):
+            uploaded[account_id] = (size, stream.read())
+            return {'email_id': 'e1', 'blob_id': 'b1'}
+
+        with patch.object(deliverer, 'EMAIL_SPOOL_MAX_MEMORY', spool_max_memory), \
+                patch.object(deliverer, 'deliver_to_jmap', side_effect=deliver):
+            result = deliverer.process_sqs_record(make_sqs_record(targets=targets))
+
+        assert result['status'] == 'ok'
+        s3.get_object.assert_called_once_with(Bucket='test-bucket', Key='emails/msg-123')
+        assert uploaded == {'acc-a': (9, b'raw email'), 'acc-b': (9, b'raw email')}
+
+    def test_target_failure_fails_record(self, deliverer, s3):
+        """A failed delivery to any target fails the record for redelivery."""
+        targets = [
+            {'target': 'a@example.com', 'destination': 'acc-a'},
+            {'target': 'b@example.com', 'destination': 'acc-b'},
+        ]
+
+        def deliver(account_id, size, stream, mailbox_ids):
+            if account_id == 'acc-b':
+                raise RuntimeError('JMAP API error 500: boom')
+            return {'email_id': 'e1', 'blob_id': 'b1'}
+
+        with patch.object(deliverer, 'deliver_to_jmap', side_effect=deliver):
+            result = deliverer.process_sqs_record(make_sqs_record(targets=targets))
+
+        assert result == {
+            'error': 'JMAP API error 500: boom',
+            'status': 'error'
+        }
+
+    def test_target_failure_cancels_queued_targets(self, deliverer, s3):
+        """A failure on any target cancels the targets still queued, without waiting for earlier ones."""
+        from concurrent.futures import ThreadPoolExecutor, wait
+        targets = [{'target': f'{n}@example.com', 'destination': f'acc-{n}'} for n in range(4)]
+        cancelled = threading.Event()
+        delivered = []
+
+        def deliver(account_id, size, stream, mailbox_ids):
+            if account_id == 'acc-1':
+                raise RuntimeError('JMAP API error 500: boom')
+            # Keep acc-0 in flight until the queued targets have been cancelled
+            cancelled.wait(timeout=5)
+            delivered.append(account_id)
+            return {'email_id': 'e1', 'blob_id': 'b1'}
+
+        def wait_for_pending(futures, **kwargs):
+            # The second wait follows cancelling the targets still queued
+            if not kwargs:
+                cancelled.set()
+            return wait(futures, **kwargs)
+
+        executor = ThreadPoolExecutor(max_workers=2)
+        try:
+            with patch.object(deliverer, '_target_executor', executor), \
+                    patch.object(deliverer, 'wait', side_effect=wait_for_pending), \
+                    patch.object(deliverer, 'deliver_to_jmap', side_effect=deliver):
+                result = deliverer.process_sqs_record(make_sqs_record(targets=targets))
+        finally:
+            executor.shutdown()
+
+        assert result['error'] == 'JMAP API error 500: boom'
+        assert delivered == ['acc-0']
+
+
+class TestLambdaHandler:
+    """Tests for the SQS batch handler."""
+
+    def test_reports_failed_records_by_message_id(self, deliverer):
+        """Only failed records are reported, identified by SQS message ID."""
+        event = {'Records': [
+            make_sqs_record(sqs_message_id='sqs-ok'),
+            make_sqs_record(targets=[], sqs_message_id='sqs-bad'),
+        ]}
+
+        with patch.object(deliverer, 'deliver_to_target', return_value={'email_id': 'e1', 'blob_id': 'b1'}), \
+                patch.object(deliverer, 'publish_metrics') as publish_metrics:
+            response = deliverer.lambda_handler(event, None)
+
+        assert response['batchItemFailures'] == [{'itemIdentifier': 'sqs-bad'}]
+        publish_metrics.assert_called_once_with(1, 1)
+
+    def test_emits_dimensionless_emf_metrics(self, deliverer, capsys):
+        """Success and failure counts are written as EMF logs without a service dimension."""
+        results = [
+            {'status': 'ok'},
+            {'status': 'error', 'error': 'boom'},
+        ]
+        records = [make_sqs_record(sqs_message_id='sqs-1'), make_sqs_record(sqs_message_id='sqs-2')]
+        with patch.object(deliverer, 'process_sqs_record', side_effect=results):
+            deliverer.lambda_handler({'Records': records}, None)
+
+        emf = None
+        for line in capsys.readouterr().out.splitlines():
+            if '"_aws"' in line:
+                emf = json.loads(line)
+        assert emf is not None
+        directive = emf['_aws']['CloudWatchMetrics'][0]
+        assert directive['Namespace'] == 'SESMail/test'
+        assert directive['Dimensions'] == [[]]
+        assert emf['JmapDeliverSuccess'] == [1.0]
+        assert emf['JmapDeliverFailure'] == [1.0]
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Unit tests for outbound_metrics_publisher.py
+
+Tests cover:
+- Dispatching SES event types through EVENT_COUNTERS
+- Skipping event types that are not counted
+- Hard (permanent) vs soft (transient) bounce classification
+- Malformed SNS messages are logged, not raised
+- StatisticValues payload sent to CloudWatch
+"""
+
+import json
+import sys
+import pytest
+from unittest.mock import MagicMock, patch
+
+# We need to mock things BEFORE importing outbound_metrics_publisher
+# So set up environment and mock boto3 first
+
+@pytest.fixture(scope='module', autouse=True)
+def setup_mocks():
+    """Set up environment and mock boto3 before any imports."""
+    import os
+    os.environ['ENVIRONMENT'] = 'test'
+
+    # Mock boto3.client before importing outbound_metrics_publisher
+    with patch('boto3.client') as mock_client:
+        mock_cloudwatch = MagicMock()
+
+        def get_client(service_name, **kwargs):
+            clients = {
+                'cloudwatch': mock_cloudwatch,
+            }
+            return clients.get(service_name, MagicMock())
+
+        mock_client.side_effect = get_client
+
+        with patch.dict(sys.modules, {'aws_xray_sdk.core': MagicMock()}):
+            # Now import the module
+            import outbound_metrics_publisher
+
+            # Store the mock clients on the module for tests to access
+            outbound_metrics_publisher._test_mocks = {
+                'cloudwatch': mock_cloudwatch,
+            }
+
+            yield outbound_metrics_publisher
+
+
+@pytest.fixture
+def publisher(setup_mocks):
+    """Get the publisher module with mocks reset."""
+    for mock in setup_mocks._test_mocks.values():
+        mock.reset_mock(return_value=True, side_effect=True)
+    return setup_mocks
+
+
+def make_sns_record(event_type, **fields):
+    """Build an SNS record carrying an SES event notification."""
+    message = {'eventType': event_type, 'mail': {'messageId': 'ses-123'}, **fields}
+    return {'Sns': {'MessageId': 'sns-1', 'Message': json.dumps(message)}}
+
+
+def published_metrics(publisher):
+    """Return the MetricData sent to put_metric_data, keyed by metric name."""
+    metric_data = []
+    for call in publisher.cloudwatch.put_metric_data.call_args_list:
+        assert call.kwargs['Namespace'] == 'SESMail/test'
+        metric_data.extend(call.kwargs['MetricData'])
+    return {datum['MetricName']: datum for datum in metric_data}
+
+
+class TestLambdaHandler:
+    """Test lambda_handler() event dispatch."""
+
+    @pytest.mark.parametrize('event_type,counter', [
+        ('Send', 'send'),
+        ('Delivery', 'delivery'),
+        ('Complaint', 'complaint'),
+        ('Reject', 'reject'),
+    ])
+    def test_counts_event_type(self, publisher, event_type, counter):
+        """Each SES event type is counted by its EVENT_COUNTERS entry."""
+        response = publisher.lambda_handler({'Records': [make_sns_record(event_type)]}, None)
+
+        metrics = json.loads(response['body'])['metrics']
+        assert metrics[counter] == 1
+        assert sum(metrics.values()) == 1
+
+    def test_skips_uncounted_event_types(self, publisher):
+        """Event types without a counter are ignored and nothing is published."""
+        response = publisher.lambda_handler({'Records': [make_sns_record('Open')]}, None)
+
+        assert sum(json.loads(response['body'])['metrics'].values()) == 0
+        publisher.cloudwatch.put_metric_data.assert_not_called()
+
+    @pytest.mark.parametrize('bounce_type,counter', [
+        ('Permanent', 'bounce_hard'),
+        ('Transient', 'bounce_soft'),
+    ])
+    def test_classifies_bounces(self, publisher, bounce_type, counter):
+        """Bounces are counted and classified as hard (permanent) or soft (transient)."""
+        record = make_sns_record('Bounce', bounce={'bounceType': bounce_type, 'bouncedRecipients': []})
+
+        response = publisher.lambda_handler({'Records': [record]}, None)
+
+        metrics = json.loads(response['body'])['metrics']
+        assert metrics['bounce'] == 1
+        assert metrics[counter] == 1
+        assert metrics['bounce_hard'] + metrics['bounce_soft'] == 1
+
+    def test_malformed_message_is_logged_not_raised(self, publisher):
+        """An SNS message that is not JSON is skipped and later records are still counted."""
+        records = [{'Sns': {'MessageId': 'sns-0', 'Message': 'not json'}}, make_sns_record('Send')]
+
+        response = publisher.lambda_handler({'Records': records}, None)
+
+        body = json.loads(response['body'])
+        assert body['processed'] == 2
+        assert body['metrics']['send'] == 1
+
+
+class TestPublishMetrics:
+    """Test publish_metrics() CloudWatch payload."""
+
+    def test_sends_counts_as_statistic_values(self, publisher):
+        """Non-zero counts are sent as a statistic set of samples of 1."""
+        publisher.publish_metrics({'send': 3, 'delivery': 0, 'bounce_hard': 1})
+
+        metrics = published_metrics(publisher)
+        assert set(metrics) == {'OutboundSend', 'OutboundBounceHard'}
+        assert metrics['OutboundSend'] == {
+            'MetricName': 'OutboundSend',
+            'StatisticValues': {'SampleCount': 3, 'Sum': 3, 'Minimum': 1, 'Maximum': 1},
+            'Unit': 'Count'
+        }
+
+    def test_put_metric_data_error_is_raised(self, publisher):
+        """A CloudWatch failure is re-raised so Lambda retries the invocation."""
+        publisher.cloudwatch.put_metric_data.side_effect = RuntimeError('throttled')
+
+        with pytest.raises(RuntimeError):
+            publisher.publish_metrics({'send': 1})